@@ -15,6 +15,8 @@ parser.add_argument('-c', '--config', type=str, help='Filename of the config fil
 parser.add_argument('-d', '--debug', help='Print errors to console.', action='store_true', default=argparse.SUPPRESS)
 parser.add_argument('-g', '--gpu', help='Use GPU rendering (default)', action='store_true', default=argparse.SUPPRESS)
 parser.add_argument('-ng', '--no_gpu', help='Use CPU rendering', action='store_true', default=argparse.SUPPRESS)
+parser.add_argument('-m', '--memory', type=int, help='Memory budget for cached results in MB (default: 1/4 of RAM, 0: unlimited)', default=argparse.SUPPRESS)
+parser.add_argument('-t', '--threads', type=int, help='Number of threads for filtering (default: all CPUs)', default=argparse.SUPPRESS)
 
 
 def main(args=None):
@@ -32,6 +34,10 @@ def main(args=None):
         kwargs2['config_filename'] = kwargs['config']
     if 'debug' in kwargs:
         kwargs2['debug'] = kwargs['debug']
+    if 'memory' in kwargs:
+        kwargs2['cache_budget'] = kwargs['memory'] * 2**20 if kwargs['memory'] > 0 else None
+    if 'threads' in kwargs:
+        kwargs2['n_threads'] = kwargs['threads']
 
     print(f'Image Viewer MKII (v{__version__}) Jan Kukacka, 2021.')
     app.start(**kwargs2)
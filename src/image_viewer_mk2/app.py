@@ -30,6 +30,10 @@ def start(file=None, image=None, **kwargs):
     # Additional optional kwargs:
     - gpu: bool. If True, PyTorch+GPU based rendering will be used (if
         installed). If False (default), defaults to NumPy+CPU rendering
+    - cache_budget: int or None. Memory budget for cached intermediate results
+        in bytes. A quarter of the physical memory by default. None disables
+        eviction.
+    - n_threads: int. Number of threads used for filtering. All CPUs by default.
     - config_filename: Filename of the config to apply.
     - config: Dictionary with config to apply.
     - return_config: bool. If True, returns also the config dict. False by default.
@@ -42,6 +46,10 @@ def start(file=None, image=None, **kwargs):
     model_kwargs = {'use_gpu': False}
     if 'gpu' in kwargs:
         model_kwargs['use_gpu'] = kwargs['gpu']
+    if 'cache_budget' in kwargs:
+        model_kwargs['cache_budget'] = kwargs['cache_budget']
+    if 'n_threads' in kwargs:
+        model_kwargs['n_threads'] = kwargs['n_threads']
 
     config = None
     if 'config_filename' in kwargs:
@@ -79,7 +87,7 @@ def start(file=None, image=None, **kwargs):
             model.attach(img_onload)
 
         presenter.mainloop()
-        result = np.array(model.render)
+        result = np.array(model.render_array)
         config = model.save()
 
     if return_config:
@@ -102,15 +110,23 @@ def render(file=None, image=None, **kwargs):
     # Additional optional kwargs:
     - gpu: bool. If True, PyTorch+GPU based rendering will be used (if
         installed). If False (default), defaults to NumPy+CPU rendering
+    - cache_budget: int or None. Memory budget for cached intermediate results
+        in bytes. A quarter of the physical memory by default. None disables
+        eviction.
+    - n_threads: int. Number of threads used for filtering. All CPUs by default.
     - return_config: bool. If True, returns also the config dict. False by default.
 
     # Returns
     - rendered image as numpy array (height, width, RGBA)
     '''
 
-    model_kwargs = {'use_gpu': False, 'drop_tasks': False}
+    model_kwargs = {'use_gpu': False}
     if 'gpu' in kwargs:
         model_kwargs['use_gpu'] = kwargs['gpu']
+    if 'cache_budget' in kwargs:
+        model_kwargs['cache_budget'] = kwargs['cache_budget']
+    if 'n_threads' in kwargs:
+        model_kwargs['n_threads'] = kwargs['n_threads']
 
     config = None
     if 'config_filename' in kwargs:
@@ -139,6 +155,6 @@ def render(file=None, image=None, **kwargs):
                         model.load(config)
             model.attach(img_onload)
 
-    result = np.array(model.render)
+    result = model.render_array
 
     return result
@@ -12,8 +12,14 @@ import numpy as np
 
 try:
     from . import filter
+    from . import chunked
+    from . import cache_manager
+    from .fingerprint import fingerprint
 except ImportError:
     from filters import filter
+    from filters import chunked
+    from filters import cache_manager
+    from filters.fingerprint import fingerprint
 
 class AnisotropicDenoising(filter.Filter):
     '''
@@ -21,18 +27,22 @@ class AnisotropicDenoising(filter.Filter):
     '''
 
     name = 'anisotropic_denoising'
+    expensive = True
 
-    def __init__(self, step_size=.15, sensitivity=.1, n_iter=10):
+    def __init__(self, step_size=.15, sensitivity=.1, n_iter=10, tolerance=0):
         '''
         # Arguments:
             - step_size:
             - sensitivity:
             - n_iter:
+            - tolerance: float. Iterations stop early once no pixel changes by
+                more than tolerance. 0 disables early stopping.
         '''
         super().__init__()
         self.step_size = step_size
         self.sensitivity = sensitivity
         self.n_iter = n_iter
+        self.tolerance = tolerance
 
     def __call__(self, img):
         '''
@@ -46,15 +56,15 @@ class AnisotropicDenoising(filter.Filter):
         if result is not None:
             return result
         else:
-            self.cache = self.call(img, self.step_size, self.sensitivity, self.n_iter)
+            self.cache = self.call(img, self.step_size, self.sensitivity, self.n_iter, self.tolerance)
             return self.cache
 
 
     @staticmethod
-    def call(img, step_size, sensitivity, n_iter, **kwargs):
+    def call(img, step_size, sensitivity, n_iter, tolerance=0, **kwargs):
         img_min, img_max = img.min(), img.max()
 
-        norm_img = anisodiff(img, step_size, sensitivity, n_iter)
+        norm_img = diffuse(img, step_size, sensitivity, n_iter, tolerance)
 
         norm_min, norm_max = norm_img.min(), norm_img.max()
         scale = (img_max-img_min) / (norm_max-norm_min)
@@ -66,6 +76,7 @@ class AnisotropicDenoising(filter.Filter):
         base_dict['params']['step_size'] = self.step_size
         base_dict['params']['sensitivity'] = self.sensitivity
         base_dict['params']['n_iter'] = self.n_iter
+        base_dict['params']['tolerance'] = self.tolerance
         return base_dict
 
     @staticmethod
@@ -73,10 +84,65 @@ class AnisotropicDenoising(filter.Filter):
         step_size = serialization['step_size']
         sensitivity = serialization['sensitivity']
         n_iter = serialization['n_iter']
-        obj = AnisotropicDenoising(step_size, sensitivity, n_iter)
+        ## Configs from older versions don't have tolerance
+        tolerance = serialization.get('tolerance', 0)
+        obj = AnisotropicDenoising(step_size, sensitivity, n_iter, tolerance)
         obj._deserialize_parent(serialization)
         return obj
 
+
+## Diffusion states are stored after every checkpoint_interval updates and
+## after the last update
+checkpoint_interval = 5
+## Intermediate diffusion states keyed by (image fingerprint, step_size,
+## sensitivity, tolerance, number of updates). States of only the last few
+## parameter sets of each pipeline stage are kept. A diffusion that stopped
+## early is stored under number of updates `converged` as tuple (number of
+## updates done, state), as the states after more updates are the same.
+__checkpoints = cache_manager.TrackedCache(stage=lambda key: key[-1],
+                                           input=lambda key: key[:-1])
+converged = np.inf
+
+def diffuse(img, step_size, sensitivity, n_iter, tolerance=0):
+    '''
+    Anisotropic diffusion (see anisodiff_inplace) that stores the state every
+    checkpoint_interval updates and after the last one. Diffusion with more
+    iterations resumes from the latest stored state of the same image and
+    parameters, fewer iterations resume from the latest earlier checkpoint.
+
+    # Returns:
+        - diffused image (float32). The array is shared and must not be
+            modified in-place.
+    '''
+    n_updates = max(n_iter-1, 0)
+    base_key = (fingerprint(img), step_size, sensitivity, tolerance)
+    stopped = __checkpoints.get(base_key + (converged,))
+    if stopped is not None and stopped[0] <= n_updates:
+        return stopped[1]
+
+    ## Find the latest stored state
+    start, state = 0, img
+    for k in range(n_updates, 0, -1):
+        checkpoint = __checkpoints.get(base_key + (k,))
+        if checkpoint is not None:
+            start, state = k, checkpoint
+            break
+    if start == n_updates:
+        return np.asarray(state, dtype=np.float32)
+
+    def store(k, state):
+        if k % checkpoint_interval == 0 and k < n_updates:
+            __checkpoints[base_key + (k,)] = state.copy()
+
+    result, n_done = anisodiff_inplace(state, step_size, sensitivity, n_updates+1,
+                                       tolerance=tolerance, start_iter=start,
+                                       callback=store)
+    if n_done < n_updates:
+        __checkpoints[base_key + (converged,)] = (n_done, result)
+    else:
+        __checkpoints[base_key + (n_done,)] = result
+    return result
+
 # ------------------------------------------------------------------------------
 #  Based on code by Alistair Muldal (c) 2012
 #      - source: https://pastebin.com/sBsPX4Y7
@@ -184,4 +250,101 @@ def anisodiff(img, gamma=0.1, kappa=50, niter=1, sigma=0, option=1):
 
     return imgout
 
+
+def anisodiff_inplace(img, gamma=0.1, kappa=50, niter=1, option=1, tolerance=0,
+                      n_threads=None, start_iter=0, callback=None):
+    """
+    Anisotropic diffusion computing the same as `anisodiff` (with sigma=0)
+    in-place on preallocated float32 buffers. Bands of rows are processed in
+    parallel on the thread pool of the chunked module.
+
+    Arguments:
+            img       - input image (2D)
+            gamma     - max value of .25 for stability
+            kappa     - conduction coefficient
+            niter     - number of iterations (as in anisodiff, niter-1
+                        updates are performed)
+            option    - 1 Perona Malik diffusion equation No 1
+                        2 Perona Malik diffusion equation No 2
+            tolerance - if > 0, stop once the largest update of a pixel in
+                        an iteration falls below tolerance
+            n_threads - number of bands processed in parallel. Defaults to
+                        chunked.get_threads().
+            start_iter- number of updates already applied to img. Diffusion
+                        continues with update start_iter+1.
+            callback  - function called as callback(n_done, imgout) after
+                        every update
+
+    Returns:
+            imgout    - diffused image (float32)
+            n_done    - number of updates applied to imgout in total
+    """
+    imgout = np.array(img, dtype=np.float32)
+    n_rows = imgout.shape[0]
+
+    ## Flux buffers. S[r] and E[:,c] hold the flux between pixels r, r+1 and
+    ## c, c+1, respectively. tmp is used for conduction and update terms.
+    S = np.zeros_like(imgout)
+    E = np.zeros_like(imgout)
+    tmp = np.empty_like(imgout)
+
+    gamma = np.float32(gamma)
+    kappa = np.float32(kappa)
+
+    if n_threads is None:
+        n_threads = chunked.get_threads()
+    ## Bands of at least chunked.min_band_rows rows
+    n_bands = max(1, min(n_threads, n_rows // chunked.min_band_rows))
+    edges = np.linspace(0, n_rows, n_bands+1).astype(int)
+    bands = list(zip(edges[:-1], edges[1:]))
+
+    def conduct(band):
+        r0, r1 = band
+        ## Differences to the south and east neighbors
+        r1_south = min(r1, n_rows-1)
+        np.subtract(imgout[r0+1:r1_south+1], imgout[r0:r1_south], out=S[r0:r1_south])
+        np.subtract(imgout[r0:r1,1:], imgout[r0:r1,:-1], out=E[r0:r1,:-1])
+
+        ## Multiply by conduction gradients
+        t = tmp[r0:r1]
+        for delta in (S[r0:r1], E[r0:r1]):
+            np.divide(delta, kappa, out=t)
+            np.square(t, out=t)
+            if option == 1:
+                np.negative(t, out=t)
+                np.exp(t, out=t)
+            elif option == 2:
+                t += 1
+                np.reciprocal(t, out=t)
+            delta *= t
+
+    def update(band):
+        r0, r1 = band
+        t = tmp[r0:r1]
+        ## Flux divergence: subtract fluxes shifted 'North/West' by one pixel
+        t[:] = S[r0:r1]
+        if r0 > 0:
+            t -= S[r0-1:r1-1]
+        else:
+            t[1:] -= S[r0:r1-1]
+        t += E[r0:r1]
+        t[:,1:] -= E[r0:r1,:-1]
+        t *= gamma
+        imgout[r0:r1] += t
+        if tolerance > 0:
+            return np.abs(t, out=t).max()
+        return 0
+
+    n_done = start_iter
+    for ii in range(start_iter+1, niter):
+        chunked.run(conduct, bands)
+        change = max(chunked.run(update, bands))
+        n_done += 1
+        if callback is not None:
+            callback(n_done, imgout)
+        if tolerance > 0 and change < tolerance:
+            break
+
+    return imgout, n_done
+
 # ------------------------------------------------------------------------------
@@ -0,0 +1,227 @@
+# ------------------------------------------------------------------------------
+#  File: backend.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Array compute backends used by the filters and compositing
+# ------------------------------------------------------------------------------
+
+import numpy as np
+from functools import reduce
+from scipy import ndimage
+
+try:
+    from . import chunked
+except ImportError:
+    from filters import chunked
+
+## scipy.ndimage boundary modes and their numpy.pad equivalents
+pad_modes = {'reflect': 'symmetric',
+             'mirror': 'reflect',
+             'nearest': 'edge',
+             'wrap': 'wrap',
+             'constant': 'constant'}
+
+class NumpyBackend(object):
+    '''
+    Reference backend. Runs every operation with NumPy/SciPy on whole arrays
+    in the calling thread. Other backends produce the same results.
+    '''
+
+    name = 'numpy'
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def row_bands(self, n_rows, halo=0):
+        '''
+        Returns bands of rows (first row, end row) processed independently.
+        '''
+        return [(0, n_rows)]
+
+    def run(self, func, items):
+        '''
+        Calls func on every item and returns the list of results.
+        '''
+        return [func(item) for item in items]
+
+    def apply(self, func, *arrays, halo=0):
+        '''
+        Applies func on the arrays. Backends may split the arrays into bands of
+        rows extended by halo rows. See chunked.apply.
+        '''
+        return func(*arrays)
+
+    def gaussian_filter(self, img, sigma, mode='reflect', truncate=4.0):
+        '''
+        Gaussian filter by direct convolution, see
+        scipy.ndimage.gaussian_filter.
+        '''
+        return ndimage.gaussian_filter(img, sigma, mode=mode, truncate=truncate)
+
+    def composite(self, images):
+        '''
+        Sums colored channels and converts them to an 8-bit image.
+
+        # Arguments:
+            - images: list of float arrays of the same shape with values in [0;1].
+
+        # Returns:
+            - uint8 array of the same shape.
+        '''
+        ## NOTE: reduce is faster here than stacking the list of arrays and
+        ##       calling np.sum on them
+        render = reduce(np.add, images)
+        render = np.minimum(render, 1) * 255
+        return render.astype(np.uint8)
+
+
+class ThreadedBackend(NumpyBackend):
+    '''
+    Multi-threaded CPU backend. Splits arrays into bands of rows processed on
+    the thread pool of the chunked module.
+    '''
+
+    name = 'threaded'
+
+    def row_bands(self, n_rows, halo=0):
+        return chunked.row_bands(n_rows, halo)
+
+    def run(self, func, items):
+        return chunked.run(func, items)
+
+    def apply(self, func, *arrays, halo=0):
+        return chunked.apply(func, *arrays, halo=halo)
+
+    def gaussian_filter(self, img, sigma, mode='reflect', truncate=4.0):
+        ## Bands of rows extended by the kernel radius give identical results
+        radius = int(truncate*sigma + 0.5)
+        func = lambda band: ndimage.gaussian_filter(band, sigma, mode=mode, truncate=truncate)
+        if mode == 'wrap':
+            ## Edge bands need the rows of the opposite edge
+            pad_width = [(radius, radius)] + [(0, 0)] * (img.ndim-1)
+            padded = np.pad(img, pad_width, mode='wrap')
+            return chunked.apply(func, padded, halo=radius)[radius:radius+img.shape[0]]
+        return chunked.apply(func, img, halo=radius)
+
+    def composite(self, images):
+        return self.apply(lambda *images: super(ThreadedBackend, self).composite(images), *images)
+
+
+class CupyBackend(ThreadedBackend):
+    '''
+    CUDA backend using CuPy. Convolutions and compositing run on the GPU,
+    element-wise operations stay on the threaded CPU backend.
+    '''
+
+    name = 'cupy'
+
+    @classmethod
+    def available(cls):
+        try:
+            import cupy
+            return cupy.cuda.runtime.getDeviceCount() > 0
+        except Exception:
+            return False
+
+    def __init__(self):
+        import cupy
+        import cupyx.scipy.ndimage
+        self.cp = cupy
+        self.ndimage = cupyx.scipy.ndimage
+
+    def gaussian_filter(self, img, sigma, mode='reflect', truncate=4.0):
+        result = self.ndimage.gaussian_filter(self.cp.asarray(img), sigma, mode=mode, truncate=truncate)
+        return self.cp.asnumpy(result)
+
+    def composite(self, images):
+        render = reduce(self.cp.add, (self.cp.asarray(image) for image in images))
+        render = self.cp.minimum(render, 1) * 255
+        return self.cp.asnumpy(render.astype(self.cp.uint8))
+
+
+class TorchBackend(ThreadedBackend):
+    '''
+    CUDA backend using PyTorch. Convolutions and compositing run on the GPU,
+    element-wise operations stay on the threaded CPU backend.
+    '''
+
+    name = 'torch'
+
+    @classmethod
+    def available(cls):
+        try:
+            import torch
+            return torch.cuda.is_available()
+        except Exception:
+            return False
+
+    def __init__(self):
+        import torch
+        self.torch = torch
+        self.device = torch.device('cuda')
+
+    def gaussian_filter(self, img, sigma, mode='reflect', truncate=4.0):
+        if img.ndim != 2:
+            return super().gaussian_filter(img, sigma, mode, truncate)
+        import torch.nn.functional as F
+
+        ## Same kernel as scipy.ndimage
+        radius = int(truncate*sigma + 0.5)
+        x = np.arange(-radius, radius+1)
+        kernel = np.exp(-0.5 * x**2 / sigma**2)
+        kernel /= kernel.sum()
+
+        padded = np.pad(np.asarray(img, dtype=float), radius, mode=pad_modes[mode])
+        padded = self.torch.as_tensor(padded, device=self.device)[None,None]
+        kernel = self.torch.as_tensor(kernel, dtype=padded.dtype, device=self.device)
+        result = F.conv2d(padded, kernel.view(1,1,-1,1))
+        result = F.conv2d(result, kernel.view(1,1,1,-1))
+        return result[0,0].cpu().numpy()
+
+    def composite(self, images):
+        render = reduce(self.torch.add, (self.torch.as_tensor(image, device=self.device) for image in images))
+        render = self.torch.clamp(render, max=1) * 255
+        return render.to(self.torch.uint8).cpu().numpy()
+
+
+__backends = {T.name: T for T in (NumpyBackend, ThreadedBackend, CupyBackend, TorchBackend)}
+__backend = ThreadedBackend()
+
+def select_backend(use_gpu):
+    '''
+    Returns the backend to use. If use_gpu is True, the first available GPU
+    backend is used, otherwise (or if none is installed) the threaded CPU one.
+    '''
+    if use_gpu:
+        for name in ('cupy', 'torch'):
+            if __backends[name].available():
+                return __backends[name]()
+    return ThreadedBackend()
+
+
+def get_backend_by_name(name):
+    '''
+    Returns a new backend object of given name, falling back to the threaded
+    CPU backend if it is not available.
+    '''
+    T_backend = __backends[name]
+    if not T_backend.available():
+        return ThreadedBackend()
+    return T_backend()
+
+
+def set_backend(backend):
+    '''
+    Sets the backend used by the current process.
+    '''
+    global __backend
+    __backend = backend
+
+
+def get_backend():
+    '''
+    Returns the backend used by the current process.
+    '''
+    return __backend
@@ -0,0 +1,344 @@
+# ------------------------------------------------------------------------------
+#  File: cache_manager.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Memory budget for cached arrays of the rendering process
+# ------------------------------------------------------------------------------
+
+import os
+import weakref
+import threading
+from contextlib import contextmanager
+
+## Default memory budget as a fraction of the physical memory
+default_budget_fraction = .25
+## Default memory budget if the size of the physical memory is unknown
+fallback_budget = 2**31
+
+class CacheManager(object):
+    '''
+    Keeps track of the memory held by cached arrays (filter caches, rendered
+    channels, ...) and evicts the least recently used ones once the total
+    size exceeds the memory budget.
+
+    Cache owners are referenced weakly and have to implement method
+    `evict(key)` which drops the given cached value. Evicted values are
+    recomputed by their owners the next time they are needed.
+    '''
+
+    def __init__(self, budget=None):
+        '''
+        # Arguments:
+            - budget: int or None. Memory budget in bytes. If None, nothing is
+                evicted and the manager only reports usage.
+        '''
+        self.budget = budget
+        self.entries = {}
+        self.hidden_groups = set()
+        self.tick = 0
+        self.n_evicted = 0
+        self.lock = threading.RLock()
+
+    def next_frame(self):
+        '''
+        Starts a new frame. Entries used within the same frame are considered
+        equally recent.
+        '''
+        with self.lock:
+            self.tick += 1
+
+    def track(self, owner, key, value, group=None, stage=0):
+        '''
+        Registers a cached value. Replaces the previous entry of the same owner
+        and key and evicts other entries if the budget is exceeded.
+
+        # Arguments:
+            - owner: object holding the cached value. Must implement `evict(key)`.
+            - key: hashable key identifying the value within the owner.
+            - value: cached array (or tuple/list/dict of arrays).
+            - group: hashable, optional. Group of the entry (channel index).
+                Entries of hidden groups are evicted first.
+            - stage: int. Position of the entry in the processing chain. Among
+                equally recent entries, earlier stages are evicted first.
+        '''
+        with self.lock:
+            self.entries[(id(owner), key)] = _Entry(weakref.ref(owner), key,
+                                                    get_nbytes(value), group,
+                                                    stage, self.tick)
+            self.enforce_budget(keep=(id(owner), key))
+
+    def touch(self, owner, key):
+        '''
+        Marks the entry as used in the current frame.
+        '''
+        with self.lock:
+            entry = self.entries.get((id(owner), key))
+            if entry is not None:
+                entry.tick = self.tick
+
+    def release(self, owner, key):
+        '''
+        Stops tracking given entry (e.g. because the owner dropped the value).
+        '''
+        with self.lock:
+            self.entries.pop((id(owner), key), None)
+
+    def set_hidden(self, group, hidden):
+        with self.lock:
+            if hidden:
+                self.hidden_groups.add(group)
+            else:
+                self.hidden_groups.discard(group)
+
+    def clear(self):
+        '''
+        Evicts all entries.
+        '''
+        with self.lock:
+            for entry_key in list(self.entries):
+                self._evict(entry_key)
+
+    @property
+    def usage(self):
+        '''
+        Current memory usage in bytes.
+        '''
+        with self.lock:
+            self._purge()
+            return sum(entry.nbytes for entry in self.entries.values())
+
+    def report(self):
+        '''
+        Returns dict with the current state of the caches.
+        '''
+        with self.lock:
+            return {'usage': self.usage,
+                    'budget': self.budget,
+                    'n_entries': len(self.entries),
+                    'n_evicted': self.n_evicted}
+
+    def enforce_budget(self, keep=None):
+        '''
+        Evicts entries until memory usage fits into the budget.
+
+        # Arguments:
+            - keep: key of an entry that must not be evicted.
+        '''
+        with self.lock:
+            if self.budget is None:
+                return
+            usage = self.usage
+            if usage <= self.budget:
+                return
+
+            ## Hidden groups go first, then least recently used, then early stages
+            candidates = sorted((entry_key for entry_key in self.entries if entry_key != keep),
+                                key=lambda entry_key: self._priority(self.entries[entry_key]))
+            for entry_key in candidates:
+                if usage <= self.budget:
+                    break
+                usage -= self.entries[entry_key].nbytes
+                self._evict(entry_key)
+
+    def _priority(self, entry):
+        return (entry.group not in self.hidden_groups, entry.tick, entry.stage)
+
+    def _evict(self, entry_key):
+        entry = self.entries.pop(entry_key)
+        owner = entry.owner()
+        if owner is not None:
+            owner.evict(entry.key)
+            self.n_evicted += 1
+
+    def _purge(self):
+        '''
+        Removes entries of owners that no longer exist.
+        '''
+        for entry_key in [k for k, e in self.entries.items() if e.owner() is None]:
+            del self.entries[entry_key]
+
+
+class _Entry(object):
+    __slots__ = ('owner', 'key', 'nbytes', 'group', 'stage', 'tick')
+
+    def __init__(self, owner, key, nbytes, group, stage, tick):
+        self.owner = owner
+        self.key = key
+        self.nbytes = nbytes
+        self.group = group
+        self.stage = stage
+        self.tick = tick
+
+
+class TrackedCache(object):
+    '''
+    Dictionary-like cache whose entries are tracked by the cache manager.
+    Entries can disappear at any time when they get evicted.
+
+    Caches of values computed from input images (keyed by their fingerprints)
+    can also drop the entries of outdated inputs: each slot (see `slot`) keeps
+    the entries of only its last few inputs. When an upstream change produces
+    a new input of a stage, entries of its older inputs are dropped, so the
+    cache does not grow with every edit.
+    '''
+
+    def __init__(self, group=None, stage=0, manager=None, input=None, max_inputs=2):
+        '''
+        # Arguments:
+            - group: function mapping a key to its group, or a fixed group.
+            - stage: function mapping a key to its stage, or a fixed stage.
+            - manager: CacheManager. Defaults to the global manager.
+            - input: function mapping a key to the input the value was
+                computed from, optional.
+            - max_inputs: int. Number of most recent inputs of each slot whose
+                entries are kept. Only used if input is given.
+        '''
+        self.group = group
+        self.stage = stage
+        self.manager = manager if manager is not None else get_manager()
+        self.data = {}
+        self.input = input
+        self.max_inputs = max_inputs
+        ## Recently used inputs of each slot, the most recent last
+        self.slot_inputs = {}
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        value = self.data[key]
+        self.manager.touch(self, key)
+        if self.input is not None:
+            self.use_input(self.input(key))
+        return value
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        group = self.group(key) if callable(self.group) else self.group
+        stage = self.stage(key) if callable(self.stage) else self.stage
+        self.manager.track(self, key, value, group, stage)
+        if self.input is not None:
+            self.use_input(self.input(key))
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.manager.release(self, key)
+
+    def get(self, key, default=None):
+        if key in self.data:
+            return self[key]
+        return default
+
+    def keys(self):
+        return list(self.data.keys())
+
+    def clear(self):
+        for key in list(self.data):
+            del self[key]
+
+    def evict(self, key):
+        self.data.pop(key, None)
+
+    def use_input(self, input):
+        '''
+        Marks input as used in the current slot. Drops entries of inputs that
+        are no longer among the last max_inputs inputs of any slot.
+        '''
+        inputs = self.slot_inputs.setdefault(current_slot(), [])
+        if len(inputs) > 0 and inputs[-1] == input:
+            return
+        if input in inputs:
+            inputs.remove(input)
+        inputs.append(input)
+        while len(inputs) > self.max_inputs:
+            dropped = inputs.pop(0)
+            if any(dropped in other for other in self.slot_inputs.values()):
+                continue
+            for key in [key for key in self.data if self.input(key) == dropped]:
+                del self[key]
+
+
+def get_nbytes(value):
+    '''
+    Returns size of an array or a (nested) tuple/list/dict of arrays in bytes
+    '''
+    if isinstance(value, (tuple, list)):
+        return sum(get_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(get_nbytes(item) for item in value.values())
+    return getattr(value, 'nbytes', 0)
+
+
+def default_budget():
+    '''
+    Returns the default memory budget in bytes, i.e. default_budget_fraction
+    of the physical memory.
+    '''
+    try:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError): # not available on Windows
+        try:
+            import ctypes
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [('dwLength', ctypes.c_ulong),
+                            ('dwMemoryLoad', ctypes.c_ulong),
+                            ('ullTotalPhys', ctypes.c_ulonglong),
+                            ('ullAvailPhys', ctypes.c_ulonglong),
+                            ('ullTotalPageFile', ctypes.c_ulonglong),
+                            ('ullAvailPageFile', ctypes.c_ulonglong),
+                            ('ullTotalVirtual', ctypes.c_ulonglong),
+                            ('ullAvailVirtual', ctypes.c_ulonglong),
+                            ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+            status = MemoryStatus()
+            status.dwLength = ctypes.sizeof(MemoryStatus)
+            if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return fallback_budget
+            memory = status.ullTotalPhys
+        except (AttributeError, OSError):
+            return fallback_budget
+    return int(memory * default_budget_fraction)
+
+
+def resolve_budget(budget):
+    '''
+    Returns the memory budget in bytes for the value of a cache_budget
+    argument: 'auto' stands for default_budget(), None for no budget.
+    '''
+    if budget == 'auto':
+        return default_budget()
+    return budget
+
+
+__manager = CacheManager()
+__local = threading.local()
+
+def get_manager():
+    '''
+    Returns the cache manager of the current process
+    '''
+    return __manager
+
+
+@contextmanager
+def slot(key):
+    '''
+    Context in which the current thread computes on behalf of given slot,
+    e.g. a stage of the pipeline of a channel. See TrackedCache.
+
+    # Arguments:
+        - key: hashable key of the slot.
+    '''
+    previous = current_slot()
+    __local.slot = key
+    try:
+        yield
+    finally:
+        __local.slot = previous
+
+
+def current_slot():
+    return getattr(__local, 'slot', None)
@@ -0,0 +1,111 @@
+# ------------------------------------------------------------------------------
+#  File: chunked.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Thread-parallel execution of filters on bands of image rows
+# ------------------------------------------------------------------------------
+
+import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+## Smallest number of rows of a band
+min_band_rows = 64
+
+__n_threads = None
+__pool = None
+__pool_lock = threading.Lock()
+__local = threading.local()
+
+def set_threads(n_threads):
+    '''
+    Sets the number of threads used by the filters.
+
+    # Arguments:
+        - n_threads: int or None. If None, all CPUs are used.
+    '''
+    global __n_threads, __pool
+    with __pool_lock:
+        __n_threads = n_threads
+        if __pool is not None:
+            __pool.shutdown(wait=False)
+            __pool = None
+
+
+def get_threads():
+    '''
+    Returns the number of threads used by the filters.
+    '''
+    return __n_threads or os.cpu_count() or 1
+
+
+def _get_pool():
+    global __pool
+    with __pool_lock:
+        if __pool is None:
+            __pool = ThreadPoolExecutor(max_workers=get_threads(),
+                                        initializer=_init_worker)
+        return __pool
+
+
+def _init_worker():
+    __local.in_worker = True
+
+
+def run(func, items):
+    '''
+    Calls func on every item in parallel threads. Calls from within the
+    threads run serially, so that nested uses can't deadlock.
+
+    # Returns:
+        - list of results in the order of items.
+    '''
+    items = list(items)
+    if len(items) <= 1 or get_threads() == 1 or getattr(__local, 'in_worker', False):
+        return [func(item) for item in items]
+    return list(_get_pool().map(func, items))
+
+
+def row_bands(n_rows, halo=0):
+    '''
+    Splits rows into one band per thread. Bands are at least min_band_rows
+    (and halo) rows high.
+
+    # Returns:
+        - list of tuples (first row, end row).
+    '''
+    n_bands = max(1, min(get_threads(), n_rows // max(min_band_rows, halo)))
+    edges = np.linspace(0, n_rows, n_bands+1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def apply(func, *arrays, halo=0):
+    '''
+    Applies func on bands of rows of the arrays in parallel threads and
+    stitches the results. Each band is extended by halo rows on both sides
+    (within the image), so that the result equals applying func on the whole
+    arrays if the support of func along the rows is at most halo.
+
+    # Arguments:
+        - func: function of arrays returning an array with the same number of
+            rows as its inputs.
+        - arrays: arrays with the same number of rows.
+        - halo: int. Support of func along the rows.
+
+    # Returns:
+        - array of results.
+    '''
+    n_rows = arrays[0].shape[0]
+    bands = row_bands(n_rows, halo)
+    if len(bands) == 1:
+        return func(*arrays)
+
+    def run_band(band):
+        r0, r1 = band
+        h0, h1 = max(0, r0-halo), min(n_rows, r1+halo)
+        result = func(*(array[h0:h1] for array in arrays))
+        return result[r0-h0:r1-h0]
+
+    return np.concatenate(run(run_band, bands))
@@ -6,15 +6,61 @@
 #  Base class for image processing filters
 # ------------------------------------------------------------------------------
 
+import numpy as np
+
+try:
+    from . import cache_manager
+    from .fingerprint import fingerprint
+except ImportError:
+    from filters import cache_manager
+    from filters.fingerprint import fingerprint
+
 class Filter(object):
     '''
     Base class for filters.
     '''
 
+    ## Point-wise filters implement `point_call` and can be fused with their
+    ## point-wise neighbors into a single pass over the image
+    pointwise = False
+
+    ## Expensive intermediate results of the filter and the parameters they
+    ## depend on, e.g. {'blurred': ('kernel_size',)}. Sub-results are memoized
+    ## by `subresult`, so changes of other parameters reuse them.
+    subresults = {}
+
+    ## Filters taking seconds per call. The renderer does not compute them
+    ## speculatively, as a running filter cannot be abandoned.
+    expensive = False
+
     def __init__(self):
         self.active = True
+        ## (group, stage) under which the cache is tracked by the cache manager
+        self.cache_tag = (None, 0)
         self.cache = None
 
+    @property
+    def cache(self):
+        if self._cache is not None:
+            cache_manager.get_manager().touch(self, 'cache')
+        return self._cache
+
+    @cache.setter
+    def cache(self, value):
+        self._cache = value
+        if value is None:
+            cache_manager.get_manager().release(self, 'cache')
+        else:
+            cache_manager.get_manager().track(self, 'cache', value, *self.cache_tag)
+
+    def evict(self, key):
+        '''
+        Called by the cache manager when the cache gets evicted. The result is
+        recomputed on the next call.
+        '''
+        if key == 'cache':
+            self._cache = None
+
     def __call__(self, img):
         '''
         Base class call handler. Child classes need to take care of case when
@@ -25,6 +71,47 @@ class Filter(object):
         if self.cache is not None:
             return self.cache
 
+    @classmethod
+    def subresult(cls, name, img, compute, **params):
+        '''
+        Returns memoized sub-result of the filter applied on the given image.
+
+        # Arguments:
+            - name: name of the sub-result, as declared in `subresults`.
+            - img: input image of the filter.
+            - compute: function without arguments computing the sub-result.
+            - params: values of the parameters the sub-result depends on.
+
+        # Returns:
+            - the sub-result. It is shared and must not be modified in-place.
+        '''
+        key = (cls.name, name, fingerprint(img)) + tuple(params[param] for param in cls.subresults[name])
+        result = _subresults.get(key)
+        if result is None:
+            result = compute()
+            _subresults[key] = result
+        return result
+
+    @staticmethod
+    def point_call(x, img_min, img_max, **kwargs):
+        '''
+        Evaluates a point-wise filter in-place on values `x` drawn from an image
+        with the given range.
+
+        # Returns:
+            - x, overwritten with the filtered values.
+        '''
+        raise NotImplementedError()
+
+    @classmethod
+    def point_range(cls, img_min, img_max, **kwargs):
+        '''
+        Returns output range of a monotonic point-wise filter applied on an
+        image with the given range.
+        '''
+        bounds = cls.point_call(np.array([img_min, img_max], dtype=float), img_min, img_max, **kwargs)
+        return bounds.min(), bounds.max()
+
     def serialize(self):
         return {'name': self.name,
                 'params': {'active': self.active}}
@@ -35,3 +122,8 @@ class Filter(object):
 
     def _deserialize_parent(self, serialization):
         self.active = serialization['active']
+
+
+## Memoized sub-results of all filters. Sub-results of only the last few input
+## images of each pipeline stage are kept.
+_subresults = cache_manager.TrackedCache(input=lambda key: key[2])
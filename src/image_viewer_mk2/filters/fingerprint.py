@@ -0,0 +1,42 @@
+# ------------------------------------------------------------------------------
+#  File: fingerprint.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Content fingerprints of arrays for keying shared caches
+# ------------------------------------------------------------------------------
+
+import hashlib
+import weakref
+import numpy as np
+
+## Fingerprints of live arrays: id -> (weak reference, fingerprint)
+__fingerprints = {}
+
+def fingerprint(arr):
+    '''
+    Returns a hash of the array contents, shape and dtype. The hash is
+    remembered for the lifetime of the array object, so arrays must not be
+    modified in-place after they were fingerprinted.
+
+    # Arguments:
+        - arr: numpy array.
+
+    # Returns:
+        - fingerprint: str.
+    '''
+    key = id(arr)
+    entry = __fingerprints.get(key)
+    if entry is not None and entry[0]() is arr:
+        return entry[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{arr.shape}{arr.dtype.str}'.encode())
+    digest.update(np.ascontiguousarray(arr).data)
+    result = digest.hexdigest()
+
+    __fingerprints[key] = (weakref.ref(arr, lambda _, key=key: _forget(key)), result)
+    return result
+
+def _forget(key):
+    __fingerprints.pop(key, None)
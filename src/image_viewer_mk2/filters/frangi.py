@@ -7,12 +7,13 @@
 # ------------------------------------------------------------------------------
 
 import numpy as np
-from skimage.filters import frangi, meijering
 
 try:
     from . import filter
+    from . import vesselness
 except ImportError:
     from filters import filter
+    from filters import vesselness
 
 class Frangi(filter.Filter):
     '''
@@ -20,6 +21,7 @@ class Frangi(filter.Filter):
     '''
 
     name = 'frangi'
+    expensive = True
 
     def __init__(self, scale_min=1, scale_max=10, scale_step=2, alpha=0.5, beta=.5, gamma=15):
         '''
@@ -56,7 +58,9 @@ class Frangi(filter.Filter):
 
         sigmas = np.arange(min(scale_min, scale_max), max(scale_min, scale_max), scale_step)
         # norm_img = frangi(img, sigmas=sigmas, alpha=alpha, beta=beta, gamma=gamma, black_ridges=False)
-        norm_img = meijering(img, sigmas=sigmas, alpha=alpha, black_ridges=False)
+        ## Hessian eigenvalues are cached per image and sigma, so only new
+        ## scales are computed
+        norm_img = vesselness.meijering(img, sigmas, alpha, black_ridges=False)
 
         norm_min, norm_max = norm_img.min(), norm_img.max()
         scale = (img_max-img_min) / (norm_max-norm_min)
@@ -19,6 +19,7 @@ class GammaCorrection(filter.Filter):
     '''
 
     name = 'gamma_correction'
+    pointwise = True
 
     def __init__(self, gamma=1):
         '''
@@ -46,17 +47,23 @@ class GammaCorrection(filter.Filter):
 
     @staticmethod
     def call(img, gamma, **kwargs):
-        img_min, img_max = img.min(), img.max()
+        return GammaCorrection.point_call(np.array(img, dtype=float), img.min(), img.max(), gamma)
 
-        norm_img = np.power(img, gamma)
+    @staticmethod
+    def point_call(x, img_min, img_max, gamma, **kwargs):
+        norm_img = np.power(x, gamma, out=x)
 
         ## Power stays within [0;1] range
         if img_min == 0 and img_max == 1:
             return norm_img
         else:
-            norm_min, norm_max = norm_img.min(), norm_img.max()
+            ## Power is monotonic so the extremes map onto the extremes
+            norm_min, norm_max = np.sort(np.power([img_min, img_max], gamma))
             scale = (img_max-img_min) / (norm_max-norm_min)
-            return img_min + (norm_img-norm_min) * scale
+            norm_img -= norm_min
+            norm_img *= scale
+            norm_img += img_min
+            return norm_img
 
 
     def serialize(self):
@@ -0,0 +1,202 @@
+# ------------------------------------------------------------------------------
+#  File: gaussian.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Gaussian filtering with cost independent of the kernel size
+# ------------------------------------------------------------------------------
+
+import numpy as np
+from collections import Counter
+from scipy import signal, fft
+
+try:
+    from . import backend
+    from . import cache_manager
+    from .fingerprint import fingerprint
+except ImportError:
+    from filters import backend
+    from filters import cache_manager
+    from filters.fingerprint import fingerprint
+
+## Largest sigma filtered by direct convolution. Larger sigmas are filtered in
+## the frequency domain, which costs the same for any sigma and differs from
+## the direct convolution by ~1e-4 of the output range.
+direct_max_sigma = 10
+## The recursive filter is off by up to a few percent of the output range, so
+## method 'auto' uses it only if use_fft is False. Its error grows with sigma
+## and with sigma relative to the image size, and its boundary handling only
+## emulates modes extending the image by its own values, hence the limits.
+recursive_max_sigma = 64
+recursive_max_fraction = 1/8
+recursive_modes = ('reflect', 'mirror', 'nearest')
+## Boundary padding of the recursive filter in sigmas
+truncate_recursive = 4.0
+## Whether method 'auto' filters large sigmas in the frequency domain
+use_fft = True
+
+def gaussian_filter(img, sigma, mode='reflect', truncate=4.0, method='auto'):
+    '''
+    Gaussian filter that picks direct convolution for small sigmas and
+    filtering in the frequency domain for large ones.
+
+    # Arguments:
+        - img: array to filter.
+        - sigma: float. Std. deviation of the gaussian kernel.
+        - mode: boundary mode, see scipy.ndimage.gaussian_filter.
+        - truncate: float. Support of the direct convolution kernel in sigmas.
+        - method: 'auto', 'direct', 'recursive' or 'fft'.
+
+    # Returns:
+        - filtered array of the same shape as img.
+    '''
+    if method == 'auto':
+        method = choose_method(img, sigma, mode, truncate)
+    __method_counts[method] += 1
+
+    if method == 'direct':
+        return backend.get_backend().gaussian_filter(img, sigma, mode=mode, truncate=truncate)
+    elif method == 'recursive':
+        result = np.asarray(img, dtype=float)
+        for axis in range(result.ndim):
+            result = recursive_gaussian1d(result, sigma, axis, mode)
+        return result
+    elif method == 'fft':
+        return fft_gaussian(img, sigma, mode, truncate)
+    else:
+        raise ValueError(f'Unknown gaussian filtering method: {method}')
+
+
+def recursive_gaussian1d(img, sigma, axis, mode='reflect'):
+    '''
+    Recursive gaussian filter along one axis. Uses the third-order filter of
+    Young & van Vliet (1995), run forward and backward. Its cost does not
+    depend on sigma, apart from the boundary padding of 4*sigma.
+
+    # Arguments:
+        - img: float array to filter.
+        - sigma: float >= 0.5. Std. deviation of the gaussian kernel.
+        - axis: int. Axis to filter along.
+        - mode: boundary mode, see scipy.ndimage.gaussian_filter.
+    '''
+    if sigma >= 2.5:
+        q = 0.98711*sigma - 0.96330
+    else:
+        q = 3.97156 - 4.14554*np.sqrt(1 - 0.26891*sigma)
+    b0 = 1.57825 + 2.44413*q + 1.4281*q**2 + 0.422205*q**3
+    b1 = 2.44413*q + 2.85619*q**2 + 1.26661*q**3
+    b2 = -(1.4281*q**2 + 1.26661*q**3)
+    b3 = 0.422205*q**3
+    B = 1 - (b1+b2+b3)/b0
+    a = [1, -b1/b0, -b2/b0, -b3/b0]
+
+    ## Pad to emulate the boundary mode
+    n = img.shape[axis]
+    pad = int(truncate_recursive*sigma) + 1
+    pad_width = [(0,0)] * img.ndim
+    pad_width[axis] = (pad, pad)
+    padded = np.pad(img, pad_width, mode=backend.pad_modes[mode])
+
+    ## Initial conditions of a steady state at the first sample
+    zi_shape = [1] * img.ndim
+    zi_shape[axis] = len(a) - 1
+    zi = signal.lfilter_zi([B], a).reshape(zi_shape)
+    first = [slice(None)] * img.ndim
+    first[axis] = slice(0, 1)
+    first = tuple(first)
+
+    ## Causal pass
+    result, _ = signal.lfilter([B], a, padded, axis=axis, zi=zi*padded[first])
+    ## Anti-causal pass
+    result = np.flip(result, axis)
+    result, _ = signal.lfilter([B], a, result, axis=axis, zi=zi*result[first])
+    result = np.flip(result, axis)
+
+    crop = [slice(None)] * img.ndim
+    crop[axis] = slice(pad, pad+n)
+    return np.ascontiguousarray(result[tuple(crop)])
+
+
+def choose_method(img, sigma, mode='reflect', truncate=4.0):
+    '''
+    Picks the filtering method for the given image and sigma. The choice
+    depends only on the arguments (not on cached spectra), so a filter always
+    gives the same result.
+
+    # Returns:
+        - 'direct', 'recursive' or 'fft'
+    '''
+    if sigma <= direct_max_sigma:
+        return 'direct'
+    if use_fft:
+        return 'fft'
+    if (sigma <= recursive_max_sigma and mode in recursive_modes
+        and sigma <= recursive_max_fraction * min(img.shape)):
+        return 'recursive'
+    return 'direct'
+
+
+def fft_gaussian(img, sigma, mode='reflect', truncate=4.0):
+    '''
+    Gaussian filter computed in the frequency domain. The image is padded by
+    at least truncate*sigma according to the boundary mode and its spectrum is
+    cached, so filtering the same image with another sigma only costs a
+    multiplication and an inverse FFT.
+
+    # Arguments:
+        - see gaussian_filter.
+    '''
+    shape, pad = _fft_shape(img.shape, sigma, mode, truncate)
+    key = (fingerprint(img), mode, shape)
+    spectrum = __spectra.get(key)
+    if spectrum is None:
+        padded = np.asarray(img, dtype=float)
+        if pad > 0:
+            padded = np.pad(padded, pad, mode=backend.pad_modes[mode])
+        spectrum = fft.rfftn(padded, s=shape)
+        __spectra[key] = spectrum
+
+    ## Transfer function of the gaussian is separable
+    transfer = np.ones((1,) * len(shape))
+    for axis, n in enumerate(shape):
+        if axis == len(shape) - 1:
+            freqs = fft.rfftfreq(n)
+        else:
+            freqs = fft.fftfreq(n)
+        axis_shape = [1] * len(shape)
+        axis_shape[axis] = len(freqs)
+        transfer = transfer * np.exp(-2 * (np.pi*sigma*freqs)**2).reshape(axis_shape)
+
+    result = fft.irfftn(spectrum * transfer, s=shape)
+    crop = tuple(slice(pad, pad+n) for n in img.shape)
+    return np.ascontiguousarray(result[crop])
+
+
+def _fft_shape(shape, sigma, mode, truncate):
+    '''
+    Returns padded shape of the FFT and the boundary padding. Paddings are
+    rounded up to powers of two, so that spectra are shared by similar sigmas.
+    '''
+    if mode == 'wrap':
+        return tuple(shape), 0
+    pad = max(16, 2**int(np.ceil(np.log2(truncate*sigma + 1))))
+    padded_shape = tuple(fft.next_fast_len(n + 2*pad, real=True) for n in shape)
+    return padded_shape, pad
+
+
+def report():
+    '''
+    Returns dict with the number of gaussian filters computed by each method
+    since the last reset_report.
+    '''
+    return dict(__method_counts)
+
+
+def reset_report():
+    __method_counts.clear()
+
+
+## Spectra of padded images keyed by (fingerprint, mode, padded shape). Spectra
+## of only the last few images of each pipeline stage are kept.
+__spectra = cache_manager.TrackedCache(input=lambda key: key[0])
+__method_counts = Counter()
@@ -7,12 +7,13 @@
 # ------------------------------------------------------------------------------
 
 import numpy as np
-from skimage.filters import gaussian
 
 try:
     from . import filter
+    from . import scale_space
 except ImportError:
     from filters import filter
+    from filters import scale_space
 
 class GaussianBlur(filter.Filter):
     '''
@@ -49,7 +50,8 @@ class GaussianBlur(filter.Filter):
     def call(img, sigma, **kwargs):
         img_min, img_max = img.min(), img.max()
 
-        norm_img = gaussian(img, sigma, preserve_range=True)
+        ## Same as skimage.filters.gaussian(img, sigma, preserve_range=True)
+        norm_img = scale_space.blur(img.astype(float, copy=False), sigma, mode='nearest')
 
         norm_min, norm_max = norm_img.min(), norm_img.max()
         scale = (img_max-img_min) / (norm_max-norm_min)
@@ -6,14 +6,17 @@
 #  Implementation of Local contrast normalizatio
 # ------------------------------------------------------------------------------
 
-from scipy.ndimage import gaussian_filter
 import happy as hp
 import numpy as np
 
 try:
     from . import filter
+    from . import backend
+    from . import scale_space
 except ImportError:
     from filters import filter
+    from filters import backend
+    from filters import scale_space
 
 class LocalNorm(filter.Filter):
     '''
@@ -22,6 +25,8 @@ class LocalNorm(filter.Filter):
     '''
 
     name = 'local_norm'
+    ## The norm map itself is shared via the scale space
+    subresults = {'norm_max': ('kernel_size',)}
 
     def __init__(self, cutoff_percentile=80, kernel_size=10):
         '''
@@ -54,10 +59,12 @@ class LocalNorm(filter.Filter):
         ## Compute input range
         img_min, img_max = img.min(), img.max()
 
-        norm = gaussian_filter(img, kernel_size)
-        cutoff = np.max(norm) * np.power(cutoff_percentile/100, 3)
-        norm_img = img / np.maximum(norm, cutoff)
-        norm_img = np.nan_to_num(norm_img)
+        norm = scale_space.blur(img, kernel_size)
+        norm_max = LocalNorm.subresult('norm_max', img, lambda: np.max(norm),
+                                       kernel_size=kernel_size)
+        cutoff = norm_max * np.power(cutoff_percentile/100, 3)
+        norm_img = backend.get_backend().apply(lambda img, norm: np.nan_to_num(img / np.maximum(norm, cutoff)),
+                                               img, norm)
 
         ## Ensure norm_img has same scale as input to enable averaging
         norm_min, norm_max = norm_img.min(), norm_img.max()
@@ -21,6 +21,7 @@ class MinMaxNorm(filter.Filter):
     '''
 
     name = 'minmax_norm'
+    pointwise = True
 
     def __init__(self, in_min=0, in_max=1, out_min=0, out_max=1):
         '''
@@ -51,12 +52,18 @@ class MinMaxNorm(filter.Filter):
 
     @staticmethod
     def call(img, in_min, in_max, out_min, out_max, **kwargs):
-        ## Compute input range
-        img = np.clip(img, a_min=in_min, a_max=in_max)
+        return MinMaxNorm.point_call(np.array(img, dtype=float), None, None,
+                                     in_min, in_max, out_min, out_max)
 
+    @staticmethod
+    def point_call(x, img_min, img_max, in_min, in_max, out_min, out_max, **kwargs):
+        ## Compute input range
+        result = np.clip(x, a_min=in_min, a_max=in_max, out=x)
 
         scale = (out_max-out_min)/(in_max-in_min)
-        result = out_min + (img-in_min)*scale
+        result -= in_min
+        result *= scale
+        result += out_min
 
         return result
 
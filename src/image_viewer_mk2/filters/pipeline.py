@@ -6,11 +6,18 @@
 #  Filtering pipeline
 # ------------------------------------------------------------------------------
 
+import numpy as np
 
 try:
+    from . import backend
+    from . import cache_manager
     from . import filter_factory
+    from . import planner
 except ImportError:
+    from filters import backend
+    from filters import cache_manager
     from filters import filter_factory
+    from filters import planner
 
 class Pipeline(object):
     '''
@@ -19,22 +26,94 @@ class Pipeline(object):
 
     def __init__(self, filters):
         self.filters = filters
+        ## Group under which filter caches are tracked (e.g. channel index)
+        self.cache_group = None
+        self._plan = None
+
+    @property
+    def plan(self):
+        '''
+        Execution plan of the pipeline. Printing it shows how the filters are
+        actually executed.
+        '''
+        if self._plan is None:
+            self._plan = planner.make_plan(self.serialize())
+        return self._plan
 
     def __call__(self, img):
-        for filter in self.filters:
-            img = filter(img)
+        steps = self.plan.steps
+
+        ## Resume after the last step with a cached output
+        start = 0
+        for s in range(len(steps)-1, -1, -1):
+            if steps[s].cached and self.filters[steps[s].indices[0]].cache is not None:
+                img = self.filters[steps[s].indices[0]].cache
+                start = s + 1
+                break
+
+        for step in steps[start:]:
+            if step.pointwise:
+                img = FusedPointwise(step.filters)(img)
+            else:
+                filter = self.filters[step.indices[0]]
+                filter.cache_tag = (self.cache_group, step.indices[0])
+                ## Shared caches keep only the recent inputs of each stage
+                with cache_manager.slot(filter.cache_tag):
+                    img = filter(img)
         return img
 
+    def preview(self, serialization, img, cancelled=None):
+        '''
+        Computes output of a modified pipeline without changing this one.
+        Cached outputs of this pipeline are reused for the leading filters that
+        match the serialization.
+
+        # Arguments:
+            - serialization: Dict with serialized modified pipeline.
+            - img: input image.
+            - cancelled: function, optional. Checked between the steps. If it
+                returns True, computation is abandoned.
+
+        # Returns:
+            - output image, or None if cancelled.
+        '''
+        filters = serialization['filters']
+        n_same = 0
+        while (n_same < min(len(filters), len(self.filters))
+               and self.filters[n_same].serialize() == filters[n_same]):
+            n_same += 1
+
+        steps = planner.make_plan(serialization).steps
+        start = 0
+        for s in range(len(steps)-1, -1, -1):
+            if (steps[s].cached and max(steps[s].indices) < n_same
+                and self.filters[steps[s].indices[0]].cache is not None):
+                img = self.filters[steps[s].indices[0]].cache
+                start = s + 1
+                break
+        return Pipeline._run_steps(steps[start:], img, cancelled)
+
     def serialize(self):
         return {'filters': [filter.serialize() for filter in self.filters]}
 
     @staticmethod
     def call(serialization, img):
-        for filter in serialization['filters']:
-            params = filter['params']
-            if params['active']:
-                T_filter = filter_factory.get_filter_by_name(filter['name'])
-                img = T_filter.call(img, **params)
+        return Pipeline._run_steps(planner.make_plan(serialization).steps, img)
+
+    @staticmethod
+    def _run_steps(steps, img, cancelled=None):
+        '''
+        Executes plan steps without caching the results.
+        '''
+        for step in steps:
+            if cancelled is not None and cancelled():
+                return None
+            if step.pointwise:
+                img = FusedPointwise(step.filters)(img)
+            else:
+                T_filter, params = step.filters[0]
+                with cache_manager.slot(('preview', step.indices[0])):
+                    img = T_filter.call(img, **params)
         return img
 
     @staticmethod
@@ -69,12 +148,59 @@ class Pipeline(object):
             if self.filters[i].serialize() != filter:
                 T_filter = filter_factory.get_filter_by_name(filter['name'])
                 new_filter = T_filter.deserialize(filter['params'])
+                self.filters[i].cache = None
                 self.filters[i] = new_filter
                 change_detected = True
             if change_detected:
                 self.filters[i].cache = None
         if len(self.filters) > len(serialization['filters']):
+            for filter in self.filters[len(serialization['filters']):]:
+                filter.cache = None
             self.filters = self.filters[:len(serialization['filters'])]
             change_detected = True
 
+        if change_detected:
+            self._plan = None
         return change_detected
+
+
+class FusedPointwise(object):
+    '''
+    Run of point-wise filters compiled into a single transform. Ranges of the
+    intermediate results are propagated analytically, so the input is scanned
+    for its min and max only once, and the filters are evaluated in-place on
+    cache-sized blocks of a single output buffer.
+    '''
+
+    ## Number of elements processed at once (fits in the L2 cache)
+    block_size = 2**15
+
+    def __init__(self, filters):
+        '''
+        # Arguments:
+            - filters: list of tuples (filter type, params dict)
+        '''
+        self.filters = filters
+
+    def __call__(self, img):
+        img_min, img_max = img.min(), img.max()
+
+        ## Input range of each filter
+        ranges = []
+        for T_filter, params in self.filters:
+            ranges.append((img_min, img_max))
+            img_min, img_max = T_filter.point_range(img_min, img_max, **params)
+
+        result = np.array(img, dtype=float)
+
+        def run_band(band):
+            flat = result[band[0]:band[1]].reshape(-1)
+            for start in range(0, flat.size, self.block_size):
+                block = flat[start:start+self.block_size]
+                for (T_filter, params), (block_min, block_max) in zip(self.filters, ranges):
+                    T_filter.point_call(block, block_min, block_max, **params)
+
+        ## Bands of rows are processed in parallel (depending on the backend)
+        compute = backend.get_backend()
+        compute.run(run_band, compute.row_bands(result.shape[0]))
+        return result
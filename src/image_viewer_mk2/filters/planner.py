@@ -0,0 +1,198 @@
+# ------------------------------------------------------------------------------
+#  File: planner.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Execution planning of filtering pipelines
+# ------------------------------------------------------------------------------
+
+import numpy as np
+
+try:
+    from . import filter
+    from . import filter_factory
+except ImportError:
+    from filters import filter
+    from filters import filter_factory
+
+
+class Clip(filter.Filter):
+    '''
+    Clips values to a given range. Only used within execution plans.
+    '''
+
+    name = 'clip'
+    pointwise = True
+
+    @staticmethod
+    def point_call(x, img_min, img_max, a_min, a_max, **kwargs):
+        return np.clip(x, a_min, a_max, out=x)
+
+
+class RescaleToRange(filter.Filter):
+    '''
+    Equivalent of an identity point-wise filter followed by the usual rescale
+    of the output to the input range. Only used within execution plans.
+    '''
+
+    name = 'rescale'
+    pointwise = True
+
+    @staticmethod
+    def point_call(x, img_min, img_max, **kwargs):
+        ## The scale of the rescale is 1, but the shift by the minimum and back
+        ## rounds the values the same way as the filter. Shift by zero is exact.
+        if img_min == 0:
+            return x
+        x -= img_min
+        x += img_min
+        return x
+
+
+class PlanStep(object):
+    '''
+    Single step of an execution plan.
+    '''
+
+    def __init__(self, filters, indices, pointwise):
+        '''
+        # Arguments:
+            - filters: list of tuples (filter type, params dict).
+            - indices: list of indices of the pipeline filters covered by this
+                step (including the elided ones).
+            - pointwise: bool. If True, the filters are evaluated as one fused
+                point-wise transform and the result is not cached.
+        '''
+        self.filters = filters
+        self.indices = indices
+        self.pointwise = pointwise
+
+    @property
+    def cached(self):
+        return not self.pointwise
+
+    def __repr__(self):
+        names = ', '.join(f'{T_filter.name}' for T_filter, _ in self.filters)
+        kind = 'fused' if self.pointwise else 'filter'
+        cached = ' (cached)' if self.cached else ''
+        return f'{kind}[{names}] <- filters {self.indices}{cached}'
+
+
+class ExecutionPlan(object):
+    '''
+    Sequence of steps to execute instead of the raw list of filters. Identity
+    stages are dropped, degenerate filters are replaced by cheap equivalents
+    and consecutive point-wise stages are fused.
+    '''
+
+    def __init__(self, steps, notes):
+        '''
+        # Arguments:
+            - steps: list of PlanSteps.
+            - notes: list of strings describing the applied simplifications.
+        '''
+        self.steps = steps
+        self.notes = notes
+
+    def __repr__(self):
+        lines = ['ExecutionPlan:']
+        lines += [f'  {i}: {step}' for i, step in enumerate(self.steps)]
+        lines += [f'  - {note}' for note in self.notes]
+        return '\n'.join(lines)
+
+
+def make_plan(serialization):
+    '''
+    Builds an execution plan of a serialized pipeline. The plan produces the
+    same output as applying the filters one by one.
+
+    # Arguments:
+        - serialization: Dict with serialized pipeline.
+
+    # Returns:
+        - ExecutionPlan
+    '''
+    notes = []
+
+    ## Simplify the individual stages. Each stage is (type, params, indices)
+    stages = []
+    for i, filter_dict in enumerate(serialization['filters']):
+        params = filter_dict['params']
+        name = filter_dict['name']
+        if not params['active']:
+            notes.append(f'filter {i} ({name}) is inactive')
+            continue
+        T_filter = filter_factory.get_filter_by_name(name)
+        T_simple, simple_params = simplify(T_filter, params)
+        if T_simple is not T_filter:
+            notes.append(f'filter {i} ({name}) replaced by {T_simple.name}')
+        stages.append((T_simple, simple_params, [i]))
+
+    ## Merge and drop redundant clips and rescales
+    merged = []
+    bounds = None
+    for T_filter, params, indices in stages:
+        ## Rescale keeps the minimum and a second shift by the same minimum
+        ## rounds the values like the first one
+        if T_filter is RescaleToRange and len(merged) > 0 and merged[-1][0] is RescaleToRange:
+            notes.append(f'rescales of filters {merged[-1][2]} and {indices} merged')
+            merged[-1][2].extend(indices)
+            continue
+        if T_filter is Clip:
+            if bounds is not None and params['a_min'] <= bounds[0] and bounds[1] <= params['a_max']:
+                notes.append(f'clip of filters {indices} is redundant')
+                merged[-1][2].extend(indices)
+                continue
+            if len(merged) > 0 and merged[-1][0] is Clip:
+                a_min = max(merged[-1][1]['a_min'], params['a_min'])
+                a_max = min(merged[-1][1]['a_max'], params['a_max'])
+                if a_min <= a_max:
+                    notes.append(f'clips of filters {merged[-1][2]} and {indices} merged')
+                    merged[-1] = (Clip, {'a_min': a_min, 'a_max': a_max}, merged[-1][2] + indices)
+                    bounds = (a_min, a_max)
+                    continue
+        merged.append((T_filter, params, indices))
+        bounds = output_bounds(T_filter, params)
+
+    ## Group consecutive point-wise stages
+    steps = []
+    for T_filter, params, indices in merged:
+        if T_filter.pointwise and len(steps) > 0 and steps[-1].pointwise:
+            steps[-1].filters.append((T_filter, params))
+            steps[-1].indices.extend(indices)
+        else:
+            steps.append(PlanStep([(T_filter, params)], list(indices), T_filter.pointwise))
+
+    return ExecutionPlan(steps, notes)
+
+
+def simplify(T_filter, params):
+    '''
+    Replaces filters with degenerate parameters by cheaper equivalents.
+
+    # Returns:
+        - tuple (filter type, params)
+    '''
+    name = T_filter.name
+    if name == 'unsharp_mask' and params['strength'] == 0:
+        return Clip, {'a_min': 0, 'a_max': 1}
+    if (name == 'minmax_norm' and params['in_min'] == params['out_min'] == 0
+        and params['in_max'] == params['out_max'] != 0):
+        return Clip, {'a_min': 0, 'a_max': params['in_max']}
+    if name == 'gamma_correction' and params['gamma'] == 1:
+        return RescaleToRange, {}
+    return T_filter, params
+
+
+def output_bounds(T_filter, params):
+    '''
+    Returns static bounds of the output values of given filter, or None if
+    they are not known.
+    '''
+    if T_filter is Clip:
+        return params['a_min'], params['a_max']
+    if T_filter.name == 'unsharp_mask':
+        return 0, 1
+    ## NOTE: Bounds of affine maps (e.g. minmax_norm) are not exact due to
+    ##       rounding, so clips after them are kept
+    return None
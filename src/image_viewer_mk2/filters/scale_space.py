@@ -0,0 +1,80 @@
+# ------------------------------------------------------------------------------
+#  File: scale_space.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Scale-space cache of gaussian blurred images shared by the filters
+# ------------------------------------------------------------------------------
+
+import numpy as np
+
+try:
+    from . import gaussian
+    from . import cache_manager
+    from .fingerprint import fingerprint
+except ImportError:
+    from filters import gaussian
+    from filters import cache_manager
+    from filters.fingerprint import fingerprint
+
+class ScaleSpace(object):
+    '''
+    Cache of gaussian blurred versions of images keyed by the image contents and
+    sigma. A blur with a new sigma is derived from the closest smaller cached
+    sigma of the same image, since blurring by s1 and then by sqrt(s2^2-s1^2)
+    equals blurring by s2.
+
+    Only blurs of the last few images of each pipeline stage are kept (see
+    TrackedCache), so blurs of outdated inputs are dropped.
+    '''
+
+    def __init__(self):
+        self.cache = cache_manager.TrackedCache(input=lambda key: key[:2])
+
+    def blur(self, img, sigma, mode='reflect'):
+        '''
+        Returns img blurred by a gaussian with given sigma. The returned array
+        is shared and must not be modified in-place.
+
+        # Arguments:
+            - img: array to blur. Must not be modified in-place afterwards.
+            - sigma: float. Std. deviation of the gaussian kernel.
+            - mode: boundary mode, see scipy.ndimage.gaussian_filter.
+        '''
+        if sigma <= 0:
+            return img
+
+        image_key = (fingerprint(img), mode)
+        key = image_key + (sigma,)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+
+        ## In the frequency domain, any sigma costs the same and the spectrum
+        ## of img is shared by all of them
+        if gaussian.choose_method(img, sigma, mode) == 'fft':
+            result = gaussian.gaussian_filter(img, sigma, mode=mode, method='fft')
+            self.cache[key] = result
+            return result
+
+        ## Find the closest smaller sigma
+        base, base_sigma = img, 0
+        for cached_key in self.cache.keys():
+            if cached_key[:2] == image_key and base_sigma < cached_key[2] < sigma:
+                cached = self.cache.get(cached_key)
+                if cached is not None:
+                    base, base_sigma = cached, cached_key[2]
+
+        result = gaussian.gaussian_filter(base, np.sqrt(sigma**2 - base_sigma**2), mode=mode)
+        self.cache[key] = result
+        return result
+
+
+__scale_space = ScaleSpace()
+
+def blur(img, sigma, mode='reflect'):
+    '''
+    Blurs the image using the shared scale-space cache of the current process.
+    See ScaleSpace.blur.
+    '''
+    return __scale_space.blur(img, sigma, mode)
@@ -22,6 +22,7 @@ class SigmoidNorm(filter.Filter):
     '''
 
     name = 'sigmoid_norm'
+    pointwise = True
 
     def __init__(self, lower=0, upper=100, new_lower=49, new_upper=51):
         '''
@@ -57,7 +58,27 @@ class SigmoidNorm(filter.Filter):
 
     @staticmethod
     def call(img, lower, upper, new_lower, new_upper, **kwargs):
-        img_min, img_max = img.min(), img.max()
+        return SigmoidNorm.point_call(np.array(img, dtype=float), img.min(), img.max(),
+                                      lower, upper, new_lower, new_upper)
+
+    @staticmethod
+    def point_call(x, img_min, img_max, lower, upper, new_lower, new_upper, **kwargs):
+        norm_img = SigmoidNorm.sigmoid(x, lower, upper, new_lower, new_upper)
+
+        ## Sigmoid is monotonic so the extremes map onto the extremes
+        bounds = np.array([img_min, img_max], dtype=float)
+        norm_min, norm_max = np.sort(SigmoidNorm.sigmoid(bounds, lower, upper, new_lower, new_upper))
+        scale = (img_max-img_min) / (norm_max-norm_min)
+        norm_img -= norm_min
+        norm_img *= scale
+        norm_img += img_min
+        return norm_img
+
+    @staticmethod
+    def sigmoid(x, lower, upper, new_lower, new_upper):
+        '''
+        In-place evaluation of the sigmoid mapping, without rescaling
+        '''
         eps = 1e-8
 
         low = lower/100
@@ -67,12 +88,19 @@ class SigmoidNorm(filter.Filter):
         upper = new_upper/100
         new_low = np.log(eps + lower/(1-lower))  # eps to avoid log(0)
         new_high = np.log(upper/(1-upper+eps))   # eps to avoid division by 0
-        norm_img = (new_high-new_low) * (img-low)/(high-low+eps) + new_low
-        norm_img = 1/(1+np.exp(-norm_img))
 
-        norm_min, norm_max = norm_img.min(), norm_img.max()
-        scale = (img_max-img_min) / (norm_max-norm_min)
-        return img_min + (norm_img-norm_min) * scale
+        ## norm_img = (new_high-new_low) * (img-low)/(high-low+eps) + new_low
+        x -= low
+        x *= new_high-new_low
+        x /= high-low+eps
+        x += new_low
+
+        ## norm_img = 1/(1+np.exp(-norm_img))
+        np.negative(x, out=x)
+        np.exp(x, out=x)
+        x += 1
+        np.reciprocal(x, out=x)
+        return x
 
 
     def serialize(self):
@@ -6,14 +6,17 @@
 #  Implementation of Unsharp mask filter
 # ------------------------------------------------------------------------------
 
-from scipy.ndimage import gaussian_filter
 import happy as hp
 import numpy as np
 
 try:
     from . import filter
+    from . import backend
+    from . import scale_space
 except ImportError:
     from filters import filter
+    from filters import backend
+    from filters import scale_space
 
 class UnsharpMask(filter.Filter):
     '''
@@ -21,6 +24,7 @@ class UnsharpMask(filter.Filter):
     '''
 
     name = 'unsharp_mask'
+    subresults = {'detail': ('kernel_size',)}
 
     def __init__(self, strength=1, kernel_size=1):
         '''
@@ -52,9 +56,11 @@ class UnsharpMask(filter.Filter):
         Taken from development version of scikit-image
         https://github.com/scikit-image/scikit-image/blob/master/skimage/filters/_unsharp_mask.py#L20
         '''
-        blurred = gaussian_filter(img, sigma=kernel_size, mode='reflect')
-        result = img + (img - blurred) * strength
-        return np.clip(result, 0, 1)
+        detail = UnsharpMask.subresult('detail', img,
+                                       lambda: img - scale_space.blur(img, kernel_size, mode='reflect'),
+                                       kernel_size=kernel_size)
+        return backend.get_backend().apply(lambda img, detail: np.clip(img + detail * strength, 0, 1),
+                                           img, detail)
 
 
     def serialize(self):
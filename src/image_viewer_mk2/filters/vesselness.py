@@ -0,0 +1,124 @@
+# ------------------------------------------------------------------------------
+#  File: vesselness.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Multi-scale vesselness with cached Hessian eigenvalues
+# ------------------------------------------------------------------------------
+
+import numpy as np
+from skimage.feature import hessian_matrix, hessian_matrix_eigvals
+
+try:
+    from . import chunked
+    from . import cache_manager
+    from .fingerprint import fingerprint
+except ImportError:
+    from filters import chunked
+    from filters import cache_manager
+    from filters.fingerprint import fingerprint
+
+class Vesselness(object):
+    '''
+    Cache of Hessian eigenvalues of images keyed by the image contents and
+    sigma. Responses of the vesselness filters only combine the cached
+    eigenvalues, so changes of their shape parameters or of the range of scales
+    only compute the new scales. Eigenvalues of only the last few images of
+    each pipeline stage are kept (see TrackedCache).
+    '''
+
+    def __init__(self):
+        self.cache = cache_manager.TrackedCache(input=lambda key: key[0])
+
+    def eigenvalues(self, img, sigmas):
+        '''
+        Returns Hessian eigenvalues of the image at given scales. Missing scales
+        are computed in parallel on the thread pool of the chunked module.
+
+        # Arguments:
+            - img: 2D array.
+            - sigmas: list of floats.
+
+        # Returns:
+            - list of arrays of shape (2, rows, cols), one per sigma, with the
+                larger eigenvalue first. The arrays are shared and must not be
+                modified in-place.
+        '''
+        image_key = fingerprint(img)
+        keys = [(image_key, round(float(sigma), 6)) for sigma in sigmas]
+        results = {key: self.cache.get(key) for key in keys}
+        missing = sorted(key for key in set(keys) if results[key] is None)
+
+        eigs = chunked.run(lambda key: hessian_eigenvalues(img, key[1]), missing)
+        for key, key_eigs in zip(missing, eigs):
+            results[key] = key_eigs
+            self.cache[key] = key_eigs
+
+        return [results[key] for key in keys]
+
+    def meijering(self, img, sigmas, alpha=None, black_ridges=False):
+        '''
+        Meijering neuriteness filter. Same as skimage.filters.meijering.
+
+        # Arguments:
+            - img: 2D array.
+            - sigmas: list of floats. Scales of the filter.
+            - alpha: float, optional. Shaping constant. Defaults to 1/3.
+            - black_ridges: bool. If True, detects dark ridges, otherwise
+                bright ones.
+
+        # Returns:
+            - array. Maximum of the normalized responses over scales.
+        '''
+        img = as_float(img)
+        if alpha is None:
+            alpha = 1 / 3
+        alpha = img.dtype.type(alpha)
+
+        result = np.zeros_like(img)
+        for eigs in self.eigenvalues(img, sigmas):
+            ## Eigenvalues of the Hessian of the image with dark ridges
+            if black_ridges:
+                e0, e1 = eigs
+            else:
+                e0, e1 = -eigs[1], -eigs[0]
+            l0 = e0 + alpha*e1
+            l1 = e1 + alpha*e0
+            vals = np.where(np.abs(l0) >= np.abs(l1), l0, l1)
+            np.maximum(vals, 0, out=vals)
+            max_val = vals.max()
+            if max_val > 0:
+                vals /= max_val
+            np.maximum(result, vals, out=result)
+        return result
+
+
+def hessian_eigenvalues(img, sigma):
+    '''
+    Eigenvalues of the Hessian of a 2D image computed with gaussian derivative
+    kernels (as in skimage.filters.meijering).
+
+    # Returns:
+        - array of shape (2, rows, cols) with the larger eigenvalue first.
+    '''
+    return hessian_matrix_eigvals(hessian_matrix(as_float(img), sigma, mode='reflect',
+                                                 use_gaussian_derivatives=True))
+
+
+def as_float(img):
+    '''
+    Casts integer images to float without rescaling (as skimage filters do).
+    '''
+    if np.issubdtype(img.dtype, np.floating):
+        return img
+    return img.astype(float)
+
+
+__vesselness = Vesselness()
+
+def meijering(img, sigmas, alpha=None, black_ridges=False):
+    '''
+    Meijering filter using the shared eigenvalue cache of the current process.
+    See Vesselness.meijering.
+    '''
+    return __vesselness.meijering(img, sigmas, alpha, black_ridges)
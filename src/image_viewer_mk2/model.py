@@ -6,13 +6,17 @@
 #  Application data model component
 # ------------------------------------------------------------------------------
 
+import os
 import numpy as np
+import threading
 import traceback
 import happy as hp
 from matplotlib.colors import PowerNorm, to_hex
 from multiprocessing import Process, Queue
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from queue import Empty
 from time import time
+from contextlib import contextmanager
 
 from PIL import ImageTk, Image
 
@@ -23,11 +27,15 @@ try:
     from .ObservableCollections.event import Event
     from .ObservableCollections.utils import make_observable, make_plain
     from .renderer import render
+    from .thumbnails import Thumbnails
     from .filters.pipeline import Pipeline
     from .filters.filter_factory import get_filter_by_name
     from .filters.local_norm import LocalNorm
     from .filters.sigmoid_norm import SigmoidNorm
+    from .filters import cache_manager
     from .utils import event_handler
+    from .utils.notifier import Notifier, notify
+    from .utils.frame_ring import FrameReader
 except ImportError:
     from ObservableCollections.observablelist import ObservableList
     from ObservableCollections.observabledict import ObservableDict
@@ -35,38 +43,92 @@ except ImportError:
     from ObservableCollections.event import Event
     from ObservableCollections.utils import make_observable, make_plain
     from renderer import render
+    from thumbnails import Thumbnails
     from filters.pipeline import Pipeline
     from filters.filter_factory import get_filter_by_name
     from filters.local_norm import LocalNorm
     from filters.sigmoid_norm import SigmoidNorm
+    from filters import cache_manager
     from utils import event_handler
+    from utils.notifier import Notifier, notify
+    from utils.frame_ring import FrameReader
 
 class Model(Observable):
     '''
     Data model object
     '''
 
-    def __init__(self, use_gpu=True, debug=False, drop_tasks=True):
+    ## Maximal number of undo steps
+    history_size = 100
+    ## Changes following each other within this many seconds form one undo step
+    history_coalesce = 1.
+    ## Seconds between checks that the renderer is still running while the
+    ## last render is awaited on exit
+    exit_poll_interval = 1.
+
+    def __init__(self, use_gpu=True, debug=False, cache_budget='auto', n_threads=None):
         super().__init__()
 
+        ## Processes notify when they put a result in their queue, see
+        ## Notifier.watch
+        self.notifier = Notifier()
+
         ## Setup image rendering process
         self.rendering_queue = Queue()
         self.rendered_queue = Queue()
-        self.rendering_process = Process(target=render, args=(self.rendering_queue, self.rendered_queue, use_gpu, debug, drop_tasks))
+        self.rendering_process = Process(target=render, args=(self.rendering_queue, self.rendered_queue, use_gpu, debug, cache_budget, n_threads, self.notifier.sender))
 
         ## Setup IO process
         self.io_task_queue = Queue()
         self.io_response_queue = Queue()
-        self.io_process = Process(target=reader, args=(self.io_task_queue, self.io_response_queue))
+        self.io_process = Process(target=reader, args=(self.io_task_queue, self.io_response_queue, self.notifier.sender))
         self.n_io_pending = 0
+        ## Id of the newest IO request and its progress
+        self.io_request_id = 0
+        self.io_progress = None
+
+        ## Thumbnails of the files in the directory, rendered in background
+        ## processes
+        self.thumbnail_renderer = Thumbnails(self.notifier.sender)
+        self.thumbnails = {}
 
         self._filename = None
         self._image = None
         self._color_space = 'RGB'
         self._render = None
-        self.suspend_render = False
+        ## Rendered frames are mapped from the renderer's shared memory
+        self.frames = FrameReader()
+        self.render_array = None
+
+        ## Batched changes, see batch()
+        self.batch_depth = 0
+        self.batch_events = {}
+
+        ## At most one render task is outstanding. Sources of changes made
+        ## meanwhile are collected and sent when the frame lands.
+        self.pending_sources = []
+        self.pending_image = False
+        ## Time of the first change not sent yet
+        self.pending_time = None
+        ## Last single change of a numerical filter parameter as tuple (source,
+        ## parameter name, change). Sent with the render task, so that the
+        ## renderer speculates with the slider step, not with the sum of the
+        ## steps collected since the last task.
+        self.last_step = None
+        self.render_in_flight = False
 
         self.response_images = None
+        self.render_stats = None
+        ## Version of the shown render. Older results are ignored.
+        self.shown_version = 0
+
+        ## Render tasks only carry the changes since the previous task. Each
+        ## task increments the version, so the renderer can detect a missed
+        ## task and request a full resync.
+        self.render_version = 0
+        self.resync_needed = True
+        ## Plain copy of the channel properties as last sent to the renderer
+        self.render_state = []
 
         self.channel_props = ObservableList()
 
@@ -76,6 +138,16 @@ class Model(Observable):
         self.channel_props.attach(event_handler.ObservableEventHandler(on_channelprops_changed, obj=self))
         self.channel_prop_clipboard = None
 
+        ## Undo history of channel properties
+        self.history = []
+        self.history_index = -1
+        self.history_time = 0
+        self.ab_state = None
+        self._restoring = False
+        ## Changes not recorded in the history yet. They are recorded from the
+        ## state sent to the renderer, see send_render.
+        self.history_pending = False
+
 
     def __enter__(self):
         self.rendering_process.start()
@@ -83,16 +155,31 @@ class Model(Observable):
         return self
 
     def __exit__(self, type, value, traceback):
+        ## Wait for the outstanding render and the changes not sent yet, for
+        ## as long as the renderer runs
+        while self.render_in_flight and self.rendering_process.is_alive():
+            self.check_for_render(timeout=self.exit_poll_interval)
+
         ## Send termination signals
         self.rendering_queue.put(None)
         self.io_task_queue.put(None)
 
-        ## Empty the result queues
-        render = 1
+        ## Empty the result queues. Frames still in the queue are shown if
+        ## the renderer did not release their shared memory yet.
+        render = self.rendered_queue.get()
         while render is not None:
+            try:
+                self.show_frame(*render)
+            except FileNotFoundError:
+                pass
             render = self.rendered_queue.get()
-            if render is not None:
-                self.render = render[0]
+
+        ## Keep copies of the last frame as the shared memory is released
+        if self.render_array is not None:
+            self.render_array = np.array(self.render_array)
+            self.response_images = [np.array(image) for image in self.response_images]
+            self._render = Image.fromarray(self.render_array)
+        self.frames.close()
 
         io_response = 1
         while io_response is not None:
@@ -101,6 +188,7 @@ class Model(Observable):
         ## Join processes
         self.rendering_process.join()
         self.io_process.join()
+        self.thumbnail_renderer.close()
 
     @property
     def filename(self):
@@ -149,22 +237,79 @@ class Model(Observable):
         self.raiseEvent('propertyChanged', propertyName='render')
 
     def load_image(self, event=None):
-        task = {'type': 'load_image', 'filename':self.filename}
+        '''
+        Requests loading of the image file (or list of files, whose channels are
+        stacked). A pending load of another file is cancelled.
+        '''
+        self.io_request_id += 1
+        task = {'type': 'load_image', 'filename':self.filename, 'request_id': self.io_request_id}
         self.io_task_queue.put(task)
         self.n_io_pending += 1
+        self.io_progress = 0
         self.raiseEvent('ioTask')
 
+        ## Neighbouring files are likely to be opened next
+        neighbours = [filename for filename in self.neighbour_files() if filename is not None]
+        if len(neighbours) > 0:
+            self.io_task_queue.put({'type': 'prefetch', 'filenames': neighbours})
+
+    def directory_files(self):
+        '''
+        Returns the image files in the directory of the current file (in
+        alphabetical order), or an empty list if no single file is open.
+        '''
+        if not isinstance(self.filename, str) or not os.path.isfile(self.filename):
+            return []
+        directory, name = os.path.split(os.path.abspath(self.filename))
+        names = sorted(n for n in os.listdir(directory)
+                       if n.lower().endswith(image_extensions) or n == name)
+        return [os.path.join(directory, n) for n in names]
+
+    def neighbour_files(self):
+        '''
+        Returns the previous and the next image file in the directory of the
+        current file. None where there is no such file.
+        '''
+        filenames = self.directory_files()
+        if len(filenames) == 0:
+            return None, None
+        index = filenames.index(os.path.abspath(self.filename))
+        previous = filenames[index-1] if index > 0 else None
+        next = filenames[index+1] if index < len(filenames)-1 else None
+        return previous, next
+
+    def request_thumbnails(self):
+        '''
+        Starts rendering thumbnails of the files in the directory of the current
+        file with the current channel properties. Files closest to the current
+        one come first.
+        '''
+        filenames = self.directory_files()
+        self.thumbnails = {}
+        if len(filenames) > 0:
+            index = filenames.index(os.path.abspath(self.filename))
+            order = sorted(filenames, key=lambda filename: abs(filenames.index(filename) - index))
+            self.thumbnail_renderer.request(order, make_plain(self.channel_props))
+        self.raiseEvent('propertyChanged', propertyName='thumbnails')
+
+    def previous_file(self):
+        filename = self.neighbour_files()[0]
+        if filename is not None:
+            self.filename = filename
+
+    def next_file(self):
+        filename = self.neighbour_files()[1]
+        if filename is not None:
+            self.filename = filename
+
     def update_image(self, image):
         '''
         Used to update the image and reload channels
         '''
-        self.suspend_render = True
-        self.image = image
-        self.update_channels()
-        self.suspend_render = False
-        e = Event('propertyChanged', self)
-        e.propertyName = 'image'
-        self.update_render(e)
+        with self.batch():
+            self.image = image
+            self.update_channels()
+            self.clear_history()
 
     def add_filter(self, channel_index, filter_obj=None, filter_dict=None, filter_name=None):
         '''
@@ -183,6 +328,10 @@ class Model(Observable):
             filter_obj = T_filter()
         if filter_obj is not None:
             filter_dict = filter_obj.serialize()
+        else:
+            ## Fill in parameters missing in dicts from older configs
+            T_filter = get_filter_by_name(filter_dict['name'])
+            filter_dict = T_filter.deserialize(make_plain(filter_dict['params'])).serialize()
         filter_dict = make_observable(filter_dict)
         self.channel_props[channel_index]['pipeline']['filters'].append(filter_dict)
         filter_dict['params'].attach(event_handler.ObservableEventHandler(self.raiseEvent, name='propertyChanged', propertyName='channel_props'))
@@ -222,22 +371,95 @@ class Model(Observable):
             self.channel_props.append(channel_property)
 
 
-    def check_for_render(self):
+    def check_for_render(self, timeout=None):
+        '''
+        Receives a rendered frame, if there is one, and sends the changes made
+        while it was rendering.
+
+        # Arguments:
+            - timeout: float, optional. Seconds to wait for the frame. By
+                default returns immediately.
+
+        # Returns:
+            - True if a frame was received.
+        '''
         try:
             # render, self.histograms, self.responses = self.rendered_queue.get_nowait()
-            render, self.response_images = self.rendered_queue.get_nowait()
-            self.render = render
+            if timeout is None:
+                frame, render_stats = self.rendered_queue.get_nowait()
+            else:
+                frame, render_stats = self.rendered_queue.get(timeout=timeout)
         except Empty as e:
-            pass
+            return False
+
+        self.render_in_flight = False
+
+        if render_stats.get('resync', False):
+            self.request_resync()
+            return True
+
+        ## Trailing edge: the renderer starts on the latest state while the
+        ## frame is being displayed
+        self.send_pending()
+        self.show_frame(frame, render_stats)
+        return True
+
+    def show_frame(self, frame, render_stats):
+        '''
+        Shows a rendered frame, unless a newer one is shown already.
+
+        # Arguments:
+            - frame: frame descriptor of the renderer (see FrameRing) or None.
+            - render_stats: dict with the version and timings of the render.
+        '''
+        if frame is not None and render_stats['version'] > self.shown_version:
+            self.shown_version = render_stats['version']
+            self.render_array, *self.response_images = self.frames.read(frame)
+            self.render_stats = render_stats
+            self.render = Image.fromarray(self.render_array)
 
-    def check_for_io(self):
+    def on_notification(self, tags):
+        '''
+        Handles notifications of the worker processes about new results.
+        A notification can arrive slightly before its result is readable from
+        the queue, so the queues are read with a timeout.
+        '''
+        for tag in tags:
+            if tag == b'render':
+                self.check_for_render(timeout=1)
+            elif tag == b'io':
+                self.check_for_io(timeout=1)
+            elif tag == b'thumbnail':
+                thumbnails = self.thumbnail_renderer.read()
+                if len(thumbnails) > 0:
+                    self.thumbnails.update(thumbnails)
+                    self.raiseEvent('propertyChanged', propertyName='thumbnails')
+
+    def check_for_io(self, timeout=None):
         try:
-            response = self.io_response_queue.get_nowait()
-            self.n_io_pending -= 1
-            if response['type'] == 'load_image':
-                self.update_image(response['image'])
+            if timeout is None:
+                response = self.io_response_queue.get_nowait()
+            else:
+                response = self.io_response_queue.get(timeout=timeout)
         except Empty as e:
-            pass
+            return
+
+        ## Only the newest request is of interest
+        if response.get('request_id', None) != self.io_request_id:
+            if response['type'] != 'progress':
+                self.n_io_pending -= 1
+            return
+
+        if response['type'] == 'progress':
+            self.io_progress = response['progress']
+            self.raiseEvent('propertyChanged', propertyName='io_progress')
+            return
+
+        self.n_io_pending -= 1
+        if response.get('cancelled', False) or response.get('exception', False):
+            return
+        if response['type'] == 'load_image':
+            self.update_image(response['image'])
 
 
     @event_handler.requires('event')
@@ -245,18 +467,177 @@ class Model(Observable):
         ## Check we have all images
         if self.image is None:
             return
-        ## Check render is not suspended
-        if self.suspend_render:
+
+        ## If image has changed, pass it to the rendering thread too
+        image_changed = (event is not None and event.action == 'propertyChanged'
+                         and event.propertyName == 'image')
+        source = None if event is None else event.source
+        if event is not None and event.action == 'itemsUpdated' and len(event.items) == 1:
+            item = event.items[0]
+            if all(isinstance(value, (int, float)) and not isinstance(value, bool)
+                   for value in (item.value, getattr(item, 'oldValue', None))):
+                self.last_step = (source, item.key, item.value - item.oldValue)
+
+        self.pending_sources.append(source)
+        self.pending_image = self.pending_image or image_changed
+        if self.pending_time is None:
+            self.pending_time = time()
+        ## Changes are recorded in the history once they are sent. It is only
+        ## noted now whether they restore an earlier state.
+        if not self._restoring:
+            self.history_pending = True
+        ## Changes within a batch or made while a frame is rendering are sent
+        ## together later
+        if self.batch_depth == 0 and not self.render_in_flight:
+            self.send_pending()
+
+    def send_pending(self):
+        '''
+        Sends the changes collected since the last render task.
+        '''
+        sources, self.pending_sources = self.pending_sources, []
+        image_changed, self.pending_image = self.pending_image, False
+        timestamp, self.pending_time = self.pending_time, None
+        if self.image is None:
             return
+        ## Sources are located only now, as indices might have changed since
+        ## the changes were made
+        changes = [None if image_changed or source is None else self.find_change(source)
+                   for source in sources]
+        self.send_render(changes, image_changed, timestamp)
 
-        render_task = {}
-        render_task['channel_properties'] = make_plain(self.channel_props)
+    def send_render(self, changes, image_changed=False, timestamp=None):
+        '''
+        Sends a render task carrying the changes of the channel properties since
+        the previous task. The version of the task is its sequence id, which
+        the renderer echoes in the render stats together with the timestamp.
 
-        ## If image has changed, pass it to the rendering thread too
-        if event is not None and event.action == 'propertyChanged' and event.propertyName == 'image':
+        # Arguments:
+            - changes: list of changes as returned by find_change. None stands
+                for an unknown change, which sends all channel properties.
+            - image_changed: bool. If True, the image is sent too.
+            - timestamp: float, optional. Time of the first change carried by
+                the task. Defaults to now.
+        '''
+        if len(changes) == 0 and not image_changed:
+            return
+
+        render_task = {'version': self.render_version + 1,
+                       'base_version': self.render_version,
+                       'timestamp': time() if timestamp is None else timestamp}
+        if image_changed:
             render_task['image'] = self.image
 
+        if self.resync_needed or image_changed or None in changes:
+            ## Full resync
+            render_task['full'] = True
+            render_task['channel_properties'] = make_plain(self.channel_props)
+            self.render_state = render_task['channel_properties']
+            self.resync_needed = False
+        else:
+            ## Channels changed as a whole are sent whole, otherwise only the
+            ## changed filters
+            channels = {channel_index for channel_index, filter_index in changes
+                        if filter_index is None}
+            filters = {change for change in changes if change[0] not in channels}
+            ## Unchanged channels are shared with the previous state
+            self.render_state = list(self.render_state)
+            for channel_index in channels | {change[0] for change in filters}:
+                self.render_state[channel_index] = make_plain(self.channel_props[channel_index])
+            if len(channels) > 0:
+                render_task['channels'] = {channel_index: self.render_state[channel_index]
+                                           for channel_index in channels}
+            if len(filters) > 0:
+                render_task['filters'] = {(channel_index, filter_index): self.render_state[channel_index]['pipeline']['filters'][filter_index]
+                                          for channel_index, filter_index in filters}
+            if self.last_step is not None and self.find_change(self.last_step[0]) in filters:
+                render_task['step'] = self.find_change(self.last_step[0]) + self.last_step[1:]
+        self.last_step = None
+
+        ## The sent state shares unchanged channels with the previous one, so
+        ## it is recorded in the history without another copy
+        if self.history_pending:
+            self.history_pending = False
+            self.record_history(self.render_state)
+
+        self.render_version += 1
         self.rendering_queue.put(render_task)
+        self.render_in_flight = True
+
+    @contextmanager
+    def batch(self):
+        '''
+        Context manager grouping changes of the model into one transaction.
+        Observer notifications and render requests raised inside are deferred
+        and on exit result in one event per changed property and at most one
+        render task. Batches can be nested, only the outermost one emits.
+
+        # Usage:
+            with model.batch():
+                for channel_property in model.channel_props:
+                    channel_property['visible'] = True
+        '''
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.end_batch()
+
+    def end_batch(self):
+        if not self.render_in_flight:
+            self.send_pending()
+
+        events, self.batch_events = self.batch_events, {}
+        for (name, _), kwargs in events.items():
+            super().raiseEvent(name, **kwargs)
+
+    def raiseEvent(self, name, **kwargs):
+        if self.batch_depth > 0:
+            key = (name, kwargs.get('propertyName', None))
+            ## Keep events about added or removed channels, as observers
+            ## rebuild their channel lists on them
+            previous = self.batch_events.get(key, None)
+            if previous is None or not self.is_structural(previous):
+                self.batch_events[key] = kwargs
+            return
+        super().raiseEvent(name, **kwargs)
+
+    @staticmethod
+    def is_structural(event_kwargs):
+        child = event_kwargs.get('child', None)
+        return child is not None and child.action in ('itemsAdded', 'itemsRemoved')
+
+    def find_change(self, source):
+        '''
+        Finds which part of the channel properties raised an event.
+
+        # Arguments:
+            - source: source object of the event.
+
+        # Returns:
+            - tuple (channel index, filter index). Filter index is None if the
+                change concerns the whole channel. Returns None if the source
+                is not found.
+        '''
+        for channel_index, channel_property in enumerate(self.channel_props):
+            if channel_index >= len(self.render_state):
+                return None
+            if (source is channel_property or source is channel_property['pipeline']
+                or source is channel_property['pipeline']['filters']):
+                return channel_index, None
+            for filter_index, filter_dict in enumerate(channel_property['pipeline']['filters']):
+                if source is filter_dict or source is filter_dict['params']:
+                    return channel_index, filter_index
+        return None
+
+    def request_resync(self):
+        '''
+        Sends the full channel properties with the next render task.
+        '''
+        self.resync_needed = True
+        self.update_render()
 
     def save(self):
         model_dict = {}
@@ -264,34 +645,113 @@ class Model(Observable):
         return model_dict
 
     def load(self, model_dict):
-        ## Suspend rendering while loading
-        self.suspend_render = True
-
-        for i, channel_property in enumerate(model_dict['channel_props']):
-            if i >= len(self.channel_props):
-                break
-            while len(self.channel_props[i]['pipeline']['filters']) > 0:
-                self.remove_filter(i, 0)
-
-            for key, value in channel_property.items():
-                if key in self.channel_props[i]:
-                    if key == 'pipeline':
-                        for filter in channel_property['pipeline']['filters']:
-                            self.add_filter(i, filter_dict=filter)
+        ## Render once when everything is loaded
+        with self.batch():
+            for i, channel_property in enumerate(model_dict['channel_props']):
+                if i >= len(self.channel_props):
+                    break
+                while len(self.channel_props[i]['pipeline']['filters']) > 0:
+                    self.remove_filter(i, 0)
+
+                for key, value in channel_property.items():
+                    if key in self.channel_props[i]:
+                        if key == 'pipeline':
+                            for filter in channel_property['pipeline']['filters']:
+                                self.add_filter(i, filter_dict=filter)
+                        else:
+                            self.channel_props[i][key] = value
                     else:
-                        self.channel_props[i][key] = value
-                else:
-                    print(f'Config key {key} could not be loaded.')
+                        print(f'Config key {key} could not be loaded.')
 
-        self.suspend_render = False
-        self.update_render()
+    def record_history(self, state):
+        '''
+        Adds a state of channel properties to the undo history. Changes
+        following each other within history_coalesce seconds (e.g. dragging
+        a slider) are merged into a single step. A new state also ends the
+        A/B comparison (see toggle_ab).
+        '''
+        if self._restoring:
+            return
+        if self.history_index >= 0 and self.history[self.history_index] == state:
+            return
+        self.ab_state = None
+        now = time()
+        del self.history[self.history_index+1:]
+        if self.history_index > 0 and now - self.history_time < self.history_coalesce:
+            self.history[-1] = state
+        else:
+            self.history.append(state)
+            if len(self.history) > self.history_size:
+                del self.history[0]
+        self.history_index = len(self.history) - 1
+        self.history_time = now
+        self.raiseEvent('propertyChanged', propertyName='history')
+
+    def flush_history(self):
+        '''
+        Records the changes not sent to the renderer yet in the history.
+        '''
+        if self.history_pending:
+            self.history_pending = False
+            self.record_history(make_plain(self.channel_props))
+
+    def clear_history(self):
+        self.history = []
+        self.history_index = -1
+        self.history_time = 0
+        self.ab_state = None
+        self.raiseEvent('propertyChanged', propertyName='history')
+
+    def restore(self, state):
+        '''
+        Restores a state of channel properties without recording it in the
+        history. Recently rendered states are served from the renderer's history
+        without recomputation.
+        '''
+        self._restoring = True
+        try:
+            self.load({'channel_props': state})
+        finally:
+            self._restoring = False
+        ## Next change starts a new undo step
+        self.history_time = 0
+
+    def undo(self):
+        self.flush_history()
+        if self.history_index > 0:
+            self.history_index -= 1
+            self.restore(self.history[self.history_index])
+            self.raiseEvent('propertyChanged', propertyName='history')
+
+    def redo(self):
+        self.flush_history()
+        if self.history_index < len(self.history) - 1:
+            self.history_index += 1
+            self.restore(self.history[self.history_index])
+            self.raiseEvent('propertyChanged', propertyName='history')
+
+    def toggle_ab(self):
+        '''
+        Switches between the current state and the state before the last change.
+        Repeated calls switch back and forth between the same two states.
+        '''
+        self.flush_history()
+        if self.ab_state is None:
+            if self.history_index <= 0:
+                return
+            other = self.history[self.history_index-1]
+        else:
+            other = self.ab_state
+        self.ab_state = make_plain(self.channel_props)
+        self.restore(other)
 
     def transpose_image(self):
         self.image = self.image.transpose(1,0,2)
 
     def autocolor(self):
-        for i, channel_prop in enumerate(self.channel_props):
-            channel_prop['color'] = str(to_hex(f'C{i%10}'))
+        with self.batch():
+            for i, channel_prop in enumerate(self.channel_props):
+                channel_prop['color'] = str(to_hex(f'C{i%10}'))
 
     def copy_params(self, channel_index):
         self.channel_prop_clipboard = make_plain(self.channel_props[channel_index])
@@ -300,59 +760,192 @@ class Model(Observable):
         if self.channel_prop_clipboard is None:
             return
 
-        ## Suspend rendering while loading
-        self.suspend_render = True
+        ## Render once when everything is pasted
+        with self.batch():
+            while len(self.channel_props[channel_index]['pipeline']['filters']) > 0:
+                self.remove_filter(channel_index, 0)
+
+            for key, value in self.channel_prop_clipboard.items():
+                if key not in ['name', 'color', 'visible', 'pipeline']:
+                    self.channel_props[channel_index][key] = value
+                elif key == 'pipeline':
+                    for filter in self.channel_prop_clipboard['pipeline']['filters']:
+                        self.add_filter(channel_index, filter_dict=filter)
+
+
+
+## Number of threads reading files of multi-file datasets
+io_threads = 4
+## Size of the blocks in which arrays are read between checks for cancellation
+read_block_bytes = 32 * 2**20
+## Interval of checking for cancellation while waiting for a prefetch, in
+## seconds
+prefetch_poll_interval = .05
+## Memory budget of recently loaded and prefetched images in bytes
+image_cache_budget = 2**30
+## Extensions of image files for navigation within a directory
+image_extensions = ('.npy', '.nii.gz', '.nii', '.mat', '.nrrd')
+
+class LoadCancelled(Exception):
+    '''
+    Raised when a load is abandoned for a newer request.
+    '''
+    pass
 
-        while len(self.channel_props[channel_index]['pipeline']['filters']) > 0:
-            self.remove_filter(channel_index, 0)
 
-        for key, value in self.channel_prop_clipboard.items():
-            if key not in ['name', 'color', 'visible', 'pipeline']:
-                self.channel_props[channel_index][key] = value
-            elif key == 'pipeline':
-                for filter in self.channel_prop_clipboard['pipeline']['filters']:
-                    self.add_filter(channel_index, filter_dict=filter)
+def reader(input_queue, output_queue, notify_sender=None):
+    '''
+    Code for the IO process. Requests are handled in a background thread, so
+    that a newer request cancels the one in progress (latest wins). Files of
+    multi-file datasets are read in parallel threads. Besides the final
+    response, loads report their progress with responses of type 'progress'.
 
-        self.suspend_render = False
-        self.update_render()
+    Loaded images are kept in a cache under image_cache_budget. Tasks of type
+    'prefetch' load files into the cache in the background without response.
+    '''
+    ## Id of the newest request. Older requests are cancelled.
+    latest = {'request_id': None, 'stopped': False}
+    requests = ThreadPoolExecutor(max_workers=1)
+    files = ThreadPoolExecutor(max_workers=io_threads)
+    prefetcher = ThreadPoolExecutor(max_workers=1)
+
+    ## Least recently used images are evicted by the cache manager of the
+    ## IO process
+    manager = cache_manager.get_manager()
+    manager.budget = image_cache_budget
+    images = cache_manager.TrackedCache()
+    ## Prefetches in progress keyed by the file
+    prefetching = {}
+    prefetching_lock = threading.Lock()
+
+    def file_key(filename):
+        return filename, os.path.getmtime(filename)
+
+    def load(filename, progress=None, cancelled=None, wait=True):
+        key = file_key(filename)
+        manager.next_frame()
+        image = images.get(key)
+        with prefetching_lock:
+            future = prefetching.get(filename, None)
+        if image is None and wait and future is not None:
+            ## Wait for the prefetch in progress, unless a newer request
+            ## cancels the load meanwhile
+            while True:
+                try:
+                    image = future.result(timeout=prefetch_poll_interval)
+                    break
+                except FutureTimeoutError:
+                    if cancelled is not None and cancelled():
+                        raise LoadCancelled()
+                except Exception:
+                    break
+        if image is None:
+            image = load_image_internal(filename, progress, cancelled)
+            images[key] = image
+        elif progress is not None:
+            progress(1)
+        return image
+
+    def prefetch(filename):
+        try:
+            return load(filename, cancelled=lambda: latest['stopped'], wait=False)
+        finally:
+            with prefetching_lock:
+                prefetching.pop(filename, None)
+
+    ## Responses are sent from several threads
+    lock = threading.Lock()
+    def respond(response):
+        with lock:
+            output_queue.put(response)
+            notify(notify_sender, b'io')
 
+    def handle(task):
+        request_id = task.get('request_id', None)
+        cancelled = lambda: latest['request_id'] != request_id
+        try:
+            response = {'type': task['type'], 'request_id': request_id}
+            if task['type'] == 'load_image':
+                filenames = task['filename']
+                if isinstance(filenames, str):
+                    filenames = [filenames]
+                progress = [0] * len(filenames)
+                def report(file_index, fraction):
+                    progress[file_index] = fraction
+                    respond({'type': 'progress', 'request_id': request_id,
+                             'progress': sum(progress) / len(progress)})
+                loaded = list(files.map(lambda i: load(filenames[i], lambda fraction: report(i, fraction), cancelled),
+                                        range(len(filenames))))
+                ## Files of a dataset are channels of one image
+                if len(loaded) == 1:
+                    response['image'] = loaded[0]
+                elif len({image.shape[:2] for image in loaded}) > 1:
+                    raise ValueError('Files of a dataset have different image sizes: '
+                                     + ', '.join(str(image.shape[:2]) for image in loaded))
+                else:
+                    response['image'] = np.concatenate(loaded, axis=2)
 
+        except LoadCancelled:
+            response['cancelled'] = True
+        except Exception as e:
+            track = traceback.format_exc()
+            print('Error in IO Thread:')
+            print(track)
+            response['exception'] = True
+        respond(response)
 
-def reader(input_queue, output_queue):
     while True:
         task = input_queue.get()
 
         ## Termination signal
         if task is None:
             # print('Exiting rendering thread')
+            latest['request_id'] = None
+            latest['stopped'] = True
             break
 
-        try:
-            response = {'type': task['type']}
-            if task['type'] == 'load_image':
-                filename = task['filename']
-                response['image'] = load_image_internal(filename)
-                # except Exception:
-                #     print('Error loading image')
-                #     response['image'] = None
-
-            output_queue.put(response)
-
-        except Exception as e:
-            track = traceback.format_exc()
-            print('Error in IO Thread:')
-            print(track)
-            response['exception'] = True
-            output_queue.put(response)
+        if task['type'] == 'prefetch':
+            ## Prefetches start after the current request is handled
+            def start_prefetch(filenames):
+                with prefetching_lock:
+                    for filename in filenames:
+                        if filename not in prefetching:
+                            prefetching[filename] = prefetcher.submit(prefetch, filename)
+            requests.submit(start_prefetch, task['filenames'])
+            continue
 
+        latest['request_id'] = task.get('request_id', None)
+        requests.submit(handle, task)
 
+    requests.shutdown(wait=True)
+    files.shutdown(wait=True)
+    prefetcher.shutdown(wait=True)
 
     ## Signal finish of the rendered queue before quitting - it needs to be emptied
     output_queue.put(None)
 
 
-def load_image_internal(filename):
-    image = hp.io.load(filename)
+def load_image_internal(filename, progress=None, cancelled=None):
+    '''
+    Loads an image file.
+
+    # Arguments:
+        - filename: str.
+        - progress: function of the loaded fraction, optional.
+        - cancelled: function returning True if the load should be abandoned,
+            optional. Checked between blocks of NumPy files and between
+            files of other formats.
+
+    # Returns:
+        - array of shape (height, width, n_channels).
+    '''
+    if cancelled is not None and cancelled():
+        raise LoadCancelled()
+
+    if filename.lower().endswith('.npy'):
+        image = read_npy(filename, progress, cancelled)
+    else:
+        image = hp.io.load(filename)
 
     ## Handle MAT files:
     try:
@@ -371,4 +964,25 @@ def load_image_internal(filename):
     if np.argmin(image.shape) != 2:
         image = np.swapaxes(image, np.argmin(image.shape), 2)
 
+    if progress is not None:
+        progress(1)
+    return image
+
+
+def read_npy(filename, progress=None, cancelled=None):
+    '''
+    Reads a NumPy file in blocks of rows, see load_image_internal.
+    '''
+    source = np.load(filename, mmap_mode='r')
+    if source.ndim == 0:
+        return np.array(source)
+    image = np.empty(source.shape, dtype=source.dtype)
+    n_rows = source.shape[0]
+    block = max(1, read_block_bytes // max(1, source[:1].nbytes))
+    for row in range(0, n_rows, block):
+        if cancelled is not None and cancelled():
+            raise LoadCancelled()
+        image[row:row+block] = source[row:row+block]
+        if progress is not None:
+            progress(min(row+block, n_rows) / n_rows * .99)
     return image
@@ -6,17 +6,21 @@
 #  Presenter component
 # ------------------------------------------------------------------------------
 
+import os
 import numpy as np
 import happy as hp
+from time import time
 from matplotlib.colors import is_color_like, to_hex
 
 try:
     from . import view as view_
     from .utils.windnd import hook_dropfiles
     from .utils import event_handler
+    from .utils.latency import LatencyMonitor
 except ImportError:
     import view as view_
     from utils import event_handler
+    from utils.latency import LatencyMonitor
     from utils.windnd import hook_dropfiles
 
 class Presenter(object):
@@ -26,6 +30,7 @@ class Presenter(object):
     def __init__(self, view, model):
         self.view = view
         self.model = model
+        self.latency = LatencyMonitor()
 
         ## Define view callbacks
         ## -- Update color previews
@@ -44,6 +49,10 @@ class Presenter(object):
         for key,var in self.view.var_channel.items():
             var.trace('w', event_handler.TkVarEventHandler(self.channel_var_onchange, key=key, var=var))
 
+        ## -- folder browsing
+        self.view.thumbnail_strip.on_select = self.select_file
+        self.view.thumbnail_strip.btn_refresh.config(command=event_handler.TkCommandEventHandler(self.model.request_thumbnails))
+
         ## -- channel control buttons
         self.view.channels_panel.btn_hide_all.config(command=event_handler.TkCommandEventHandler(self.hide_all))
         self.view.channels_panel.btn_show_all.config(command=event_handler.TkCommandEventHandler(self.show_all))
@@ -66,14 +75,28 @@ class Presenter(object):
         self.view.bind('<Control-s>', event_handler.TkEventHandler(self.save_render))
         self.view.bind('<Control-o>', event_handler.TkEventHandler(self.load_image))
         self.view.bind('<Control-t>', event_handler.TkEventHandler(self.model.transpose_image))
+        self.view.bind('<Control-z>', event_handler.TkEventHandler(self.model.undo))
+        self.view.bind('<Control-y>', event_handler.TkEventHandler(self.model.redo))
+        self.view.bind('<Control-b>', event_handler.TkEventHandler(self.model.toggle_ab))
+        self.view.bind('<Prior>', event_handler.TkEventHandler(self.model.previous_file))
+        self.view.bind('<Next>', event_handler.TkEventHandler(self.model.next_file))
+        self.view.bind('<Control-f>', event_handler.TkEventHandler(self.toggle_browse))
 
         ## -- bind menu commands
         self.view.menu['file']['obj'].entryconfig(self.view.menu['file']['load_image'], command=event_handler.TkCommandEventHandler(self.load_image))
+        self.view.menu['file']['obj'].entryconfig(self.view.menu['file']['previous_file'], command=event_handler.TkCommandEventHandler(self.model.previous_file))
+        self.view.menu['file']['obj'].entryconfig(self.view.menu['file']['next_file'], command=event_handler.TkCommandEventHandler(self.model.next_file))
         self.view.menu['file']['obj'].entryconfig(self.view.menu['file']['save_render'], command=event_handler.TkCommandEventHandler(self.save_render))
         self.view.menu['file']['obj'].entryconfig(self.view.menu['file']['save_config'], command=event_handler.TkCommandEventHandler(self.save_model))
         self.view.menu['file']['obj'].entryconfig(self.view.menu['file']['load_config'], command=event_handler.TkCommandEventHandler(self.load_model))
+        self.view.menu['edit']['obj'].entryconfig(self.view.menu['edit']['undo'], command=event_handler.TkCommandEventHandler(self.model.undo))
+        self.view.menu['edit']['obj'].entryconfig(self.view.menu['edit']['redo'], command=event_handler.TkCommandEventHandler(self.model.redo))
+        self.view.menu['edit']['obj'].entryconfig(self.view.menu['edit']['toggle_ab'], command=event_handler.TkCommandEventHandler(self.model.toggle_ab))
         self.view.menu['image']['obj'].entryconfig(self.view.menu['image']['transpose'], command=event_handler.TkCommandEventHandler(self.model.transpose_image))
         self.view.menu['image']['obj'].entryconfig(self.view.menu['image']['autocolor'], command=event_handler.TkCommandEventHandler(self.model.autocolor))
+        self.view.menu['view']['obj'].entryconfig(self.view.menu['view']['browse'], command=event_handler.TkCommandEventHandler(self.toggle_browse))
+        if 'save_latency' in self.view.menu['view']:
+            self.view.menu['view']['obj'].entryconfig(self.view.menu['view']['save_latency'], command=event_handler.TkCommandEventHandler(self.save_latency))
 
         ## -- adding filters
         for key, val in self.view.menu_add_filter.items():
@@ -90,8 +113,8 @@ class Presenter(object):
         ## Define model callbacks
         self.model.attach(event_handler.ObservableEventHandler(self.model_onchange))
 
-        ## Hook on model rendering updates
-        self.check_model_for_render()
+        ## Hook on results of the model's rendering and IO processes
+        self.model.notifier.watch(self.view, self.model_onnotification)
 
         ## Hook drag'n'drop files
         hook_dropfiles(self.view, self.drag_file)
@@ -107,15 +130,9 @@ class Presenter(object):
             color_preview.bind('<Double-Button-1>', event_handler.TkEventHandler(self.pick_color, var=self.view.channels_panel.var_channels[i]['color']))
 
 
-    def check_model_for_render(self):
-        self.model.check_for_render()
-        self.view.after(50, self.check_model_for_render)
-
-    def check_model_for_io(self):
-        self.model.check_for_io()
-        if self.model.n_io_pending > 0:
-            self.view.after(50, self.check_model_for_io)
-        else:
+    def model_onnotification(self, tags):
+        self.model.on_notification(tags)
+        if self.model.n_io_pending == 0:
             self.view.loader.hide()
 
     @event_handler.requires('event')
@@ -125,7 +142,6 @@ class Presenter(object):
         '''
         if event.action == 'ioTask':
             self.view.loader.show()
-            self.check_model_for_io()
 
         if event.action == 'propertyChanged':
             if event.propertyName == 'channel_props':
@@ -138,9 +154,17 @@ class Presenter(object):
                 active_channel = self.view.get_active_channel()
                 if active_channel < len(self.model.channel_props):
                     self.channel_onchange()
+            if event.propertyName == 'thumbnails':
+                self.view.thumbnail_strip.update_thumbnails(self.model.thumbnails)
+            if event.propertyName == 'filename' and self.view.thumbnail_strip.visible:
+                self.update_browse()
+            if event.propertyName == 'io_progress':
+                self.view.loader.set_progress(self.model.io_progress)
             if event.propertyName == 'render':
                 if self.model.render is not None:
                     self.view.show_image(self.model.render)
+                    ## Idle callbacks run after the frame is drawn
+                    self.view.after_idle(self.record_latency, self.model.render_stats)
 
                 if self.model.response_images is not None:
                     channel_index = self.view.get_active_channel()
@@ -156,6 +180,48 @@ class Presenter(object):
             print('Error saving model as', filename)
             print(e)
 
+    def toggle_browse(self, *_):
+        if self.view.thumbnail_strip.visible:
+            self.view.thumbnail_strip.hide()
+            self.model.thumbnail_renderer.cancel()
+        else:
+            self.view.thumbnail_strip.show()
+            self.update_browse()
+
+    def update_browse(self):
+        '''
+        Shows the files of the current directory in the thumbnail strip.
+        Thumbnails are rendered again only if the directory changed.
+        '''
+        filenames = self.model.directory_files()
+        current = os.path.abspath(self.model.filename) if len(filenames) > 0 else None
+        if filenames != self.view.thumbnail_strip.filenames:
+            self.view.thumbnail_strip.set_files(filenames, current)
+            self.model.request_thumbnails()
+        else:
+            self.view.thumbnail_strip.set_current(current)
+
+    def select_file(self, filename):
+        self.model.filename = filename
+
+    def record_latency(self, render_stats):
+        '''
+        Records the input-to-display latency of a shown frame.
+        '''
+        if render_stats is None or 'timestamp' not in render_stats:
+            return
+        self.latency.add(render_stats['version'], time() - render_stats['timestamp'])
+        if self.view.debug:
+            self.view.show_overlay(self.latency.summary())
+
+    def save_latency(self):
+        filename = self.view.asksaveasfilename(title='Save latency log as...', filetypes=[('JSON files', '.json')], initialfile='latency.json')
+        try:
+            self.latency.dump(filename)
+        except Exception as e:
+            print('Error saving latency log as', filename)
+            print(e)
+
     def load_model(self):
         filename = self.view.askopenfilename(title='Load config file...', filetypes=[('JSON files', '.json')])
         try:
@@ -251,13 +317,15 @@ class Presenter(object):
 
     def hide_all(self, *_):
         cindex = self.view.get_active_channel()
-        for i in range(len(self.model.channel_props)):
-            if i != cindex:
-                self.model.channel_props[i]['visible'] = False
+        with self.model.batch():
+            for i in range(len(self.model.channel_props)):
+                if i != cindex:
+                    self.model.channel_props[i]['visible'] = False
 
     def show_all(self, *_):
-        for i in range(len(self.model.channel_props)):
-            self.model.channel_props[i]['visible'] = True
+        with self.model.batch():
+            for i in range(len(self.model.channel_props)):
+                self.model.channel_props[i]['visible'] = True
 
     def render_to_clipboard(self):
         '''
@@ -6,55 +6,134 @@
 #  Image rendering thread code
 # ------------------------------------------------------------------------------
 
+import copy
 import traceback
 import numpy as np
 import happy as hp
-from PIL import Image
 from time import time
 from queue import Empty
-from functools import reduce
 from multiprocessing import Process, Queue
 from matplotlib.colors import PowerNorm
 
 try:
     from .filters.pipeline import Pipeline
+    from .filters.filter_factory import get_filter_by_name
+    from .filters import cache_manager
+    from .filters import gaussian
+    from .filters import chunked
+    from .filters import backend
+    from .utils.notifier import notify
+    from .utils.frame_ring import FrameWriter
 except ImportError:
     from filters.pipeline import Pipeline
+    from filters.filter_factory import get_filter_by_name
+    from filters import cache_manager
+    from filters import gaussian
+    from filters import chunked
+    from filters import backend
+    from utils.notifier import notify
+    from utils.frame_ring import FrameWriter
 
 
-def render(rendering_queue, rendered_queue, use_gpu, debug, drop_tasks=True):
+def render(rendering_queue, rendered_queue, use_gpu, debug, cache_budget='auto', n_threads=None, notify_sender=None):
     '''
-    Code for the rendering process
+    Code for the rendering process. Every consumed task (or group of queued
+    tasks) is answered by exactly one response (frame, stats), so that the
+    model can keep track of the outstanding task. Frame is a descriptor of
+    the composite and response images in shared memory (see FrameWriter) or
+    None.
+
+    # Arguments:
+        - use_gpu: bool. If True, a GPU backend (CuPy or PyTorch) is used if
+            installed. Otherwise the multi-threaded CPU backend is used.
+        - cache_budget: int, 'auto' or None. Memory budget for cached
+            intermediate results in bytes. 'auto' uses a fraction of the
+            physical memory (see cache_manager.default_budget). If None,
+            caches are never evicted.
+        - n_threads: int or None. Number of threads used by the filters. If
+            None, all CPUs are used.
+        - notify_sender: sending end of a Notifier, optional. Notified after
+            every response.
     '''
     image_local = None
     image_local_changed = False
     pipelines = {}
-    cache = {}
+    manager = cache_manager.get_manager()
+    manager.budget = cache_manager.resolve_budget(cache_budget)
+    chunked.set_threads(n_threads)
+    compute = backend.select_backend(use_gpu)
+    backend.set_backend(compute)
+    if debug:
+        print(f'Rendering backend: {compute.name}')
+    ## Rendered channels are tracked as the last stage of their channel
+    cache = cache_manager.TrackedCache(group=lambda channel_index: channel_index,
+                                       stage=float('inf'))
+    ## Normalized channels are kept so that their identity (and fingerprint
+    ## used by the shared caches of the filters) is stable between renders
+    inputs = cache_manager.TrackedCache(group=lambda channel_index: channel_index,
+                                        stage=-1)
+    ## Renders of neighbouring values of the last edited parameter, keyed by
+    ## channel_key
+    speculative = cache_manager.TrackedCache(group=lambda key: key[0],
+                                             stage=float('inf'))
+    speculation_jobs = []
+    ## Copy of the channel properties updated by the render tasks
+    state = RenderState()
+    ## channel_key of each channel
+    keys = {}
+    ## Recently rendered channels keyed by channel_key and composites keyed by
+    ## the tuple of keys of the visible channels
+    history = cache_manager.TrackedCache(group=lambda key: key[0],
+                                         stage=float('inf'))
+    composites = cache_manager.TrackedCache(stage=float('inf'))
+    frames = FrameWriter()
     while True:
-        ## Flush old tasks, work only on the last one
-        ## NOTE: This is only reliable with a single consumer thread
-        task = rendering_queue.get()
-        if task is not None and 'image' in task:
-            image_local = task['image']
-            image_local_changed = True
-
-        if drop_tasks:
+        ## Use idle time to render neighbouring values of the edited parameter
+        if len(speculation_jobs) > 0 and rendering_queue.empty():
+            channel_index, channel_property = speculation_jobs.pop(0)
+            key = channel_key(channel_index, channel_property)
             try:
-                while True:
-                    task = rendering_queue.get(False)
-                    # task = rendering_queue.get(True, .05)
-                    if task is not None and 'image' in task:
-                        image_local = task['image']
-                        image_local_changed = True
-                    # print('Dropping a task')
-            except Empty:
-                pass
+                if (key not in speculative and key not in history
+                    and channel_index in pipelines and channel_index in inputs):
+                    image = inputs[channel_index]
+                    ## Abandon the work as soon as a real task arrives
+                    output_image = pipelines[channel_index].preview(channel_property['pipeline'], image,
+                                                                    cancelled=lambda: not rendering_queue.empty())
+                    if output_image is not None:
+                        lru_put(speculative, key, color_channel(image, output_image, channel_property['color']),
+                                speculation_size)
+            except Exception:
+                if debug:
+                    print('Error in speculative rendering:')
+                    print(traceback.format_exc())
+            continue
+
+        ## Collect all queued tasks and render only once
+        ## NOTE: This is only reliable with a single consumer thread
+        tasks = [rendering_queue.get()]
+        try:
+            while True:
+                tasks.append(rendering_queue.get(False))
+        except Empty:
+            pass
 
         ## Termination signal
-        if task is None:
+        if None in tasks:
             # print('Exiting rendering thread')
             break
 
+        ## Tasks carry changes, so none of them can be dropped
+        for task in tasks:
+            if 'image' in task:
+                image_local = task['image']
+                image_local_changed = True
+            state.apply(task)
+            state.timestamp = min(state.timestamp, task.get('timestamp', state.timestamp))
+        if state.resync_needed:
+            rendered_queue.put((None, {'resync': True}))
+            notify(notify_sender, b'render')
+            continue
+
         time_render = 0
         time_validation = 0
         time_coloring = 0
@@ -65,37 +144,66 @@ def render(rendering_queue, rendered_queue, use_gpu, debug, drop_tasks=True):
             if image_local_changed:
                 pipelines = {}
                 colors = {}
+                cache.clear()
+                inputs.clear()
+                speculative.clear()
+                history.clear()
+                composites.clear()
+                keys = {}
                 image_local_changed = False
 
-
-            for channel_index, channel_property in enumerate(task['channel_properties']):
+            manager.next_frame()
+            gaussian.reset_report()
+            n_speculative_hits = 0
+            n_history_hits = 0
+            composite_key = []
+            for channel_index, channel_property in enumerate(state.channel_properties):
+                manager.set_hidden(channel_index, not channel_property['visible'])
                 ## Ignore hidden channels
                 if not channel_property['visible']:
+                    composite_key.append(None)
                     bkg = np.zeros((128,256,4), dtype=np.uint8)
                     bkg[::32] = bkg[-1] = bkg[:,::32] = bkg[:,-1] = 0x66
                     response_images.append(bkg)
                     continue
 
                 image = image_local[...,channel_index]
+                ## Only channels changed by the tasks are compared
+                changed = channel_index in state.dirty or channel_index not in keys
+                if changed:
+                    keys[channel_index] = channel_key(channel_index, channel_property)
+                key = keys[channel_index]
+                composite_key.append(key)
                 t1 = time()
                 if (channel_index not in pipelines
-                    or pipelines[channel_index].update(channel_property['pipeline'])
-                    or channel_property['color'] != colors[channel_index]):
+                    or (changed and (pipelines[channel_index].update(channel_property['pipeline'])
+                                     or channel_property['color'] != colors[channel_index]))
+                    or channel_index not in cache):
 
                     if channel_index not in pipelines:
                         pipelines[channel_index] = Pipeline.deserialize(channel_property['pipeline'])
+                        pipelines[channel_index].cache_group = channel_index
                     t2 = time()
-                    mn,mx = image.min(), image.max()
-                    image = (image-mn)/(mx-mn)
-                    output_image = pipelines[channel_index](image)
-
+                    if channel_index not in inputs:
+                        mn,mx = image.min(), image.max()
+                        inputs[channel_index] = (image-mn)/(mx-mn)
+                    image = inputs[channel_index]
                     colors[channel_index] = channel_property['color']
-                    cmap = hp.plots.cmap((0,'#444444'),(1/256, 'k'), (1,channel_property['color']))
-                    response_image = render_response(image, output_image, cmap)
-                    t3 = time()
-                    output_image = hp.plots.cmap('k', channel_property['color'])(output_image)
+                    if key in speculative:
+                        output_image, response_image = speculative[key]
+                        n_speculative_hits += 1
+                        t3 = time()
+                    elif key in history:
+                        output_image, response_image = lru_get(history, key)
+                        n_history_hits += 1
+                        t3 = time()
+                    else:
+                        output_image = pipelines[channel_index](image)
+                        t3 = time()
+                        output_image, response_image = color_channel(image, output_image, channel_property['color'])
                     t4 = time()
                     cache[channel_index] = output_image, response_image
+                    lru_put(history, key, (output_image, response_image), history_size)
                 else:
                     t2 = time()
                     output_image, response_image = cache[channel_index]
@@ -109,25 +217,235 @@ def render(rendering_queue, rendered_queue, use_gpu, debug, drop_tasks=True):
 
             ## Render
             t5 = time()
-            ## NOTE: reduce is faster here than stacking the list of arrays and
-            ##       calling np.sum on them
-            render = reduce(np.add, processed_images)
-            render = np.minimum(render, 1) * 255
-            render = Image.fromarray(render.astype(np.uint8))
+            composite_key = tuple(composite_key)
+            if composite_key in composites:
+                render = lru_get(composites, composite_key)
+            else:
+                render = compute.composite(processed_images)
+                lru_put(composites, composite_key, render, history_size)
             t6 = time()
             # if debug:
             #     print(f'Pipeline validation: {time_validation:.3f} Rendering: {time_render:.3f} Coloring: {time_coloring:.3f} Sum: {t6-t5:.3f} Total: {t6-t0:.3f}')
-            rendered_queue.put((render, response_images))
+            stats = {'time': t6-t0,
+                     'cache': manager.report(),
+                     'gaussian': gaussian.report(),
+                     'backend': compute.name,
+                     'speculative_hits': n_speculative_hits,
+                     'history_hits': n_history_hits,
+                     'version': state.version,
+                     'timestamp': state.timestamp}
+            rendered_queue.put((frames.write([render] + response_images), stats))
+            notify(notify_sender, b'render')
+
+            speculation_jobs = plan_speculation(state)
+            state.rendered()
         except Exception as e:
             if debug:
                 track = traceback.format_exc()
                 print('Error in Rendering Thread:')
                 print(track)
+            rendered_queue.put((None, {'error': True}))
+            notify(notify_sender, b'render')
 
+    frames.close()
     ## Signal finish of the rendered queue before quitting - it needs to be emptied
     rendered_queue.put(None)
 
 
+def color_channel(input_image, output_image, color):
+    '''
+    Colors rendered channel and renders its response curve.
+
+    # Returns:
+        - colored channel (RGBA array)
+        - response image
+    '''
+    cmap = hp.plots.cmap((0,'#444444'),(1/256, 'k'), (1,color))
+    response_image = render_response(input_image, output_image, cmap)
+    output_image = hp.plots.cmap('k', color)(output_image)
+    return output_image, response_image
+
+
+## Number of kept speculative renders
+speculation_size = 4
+## Number of kept recently rendered channels (and composites)
+history_size = 8
+
+def lru_get(cache, key):
+    '''
+    Returns value of a cache and marks it as the most recently used.
+    '''
+    value = cache[key]
+    del cache[key]
+    cache[key] = value
+    return value
+
+
+def lru_put(cache, key, value, size):
+    '''
+    Stores value in a cache and drops the least recently used values to
+    keep at most size values.
+    '''
+    if key in cache:
+        del cache[key]
+    cache[key] = value
+    for old_key in cache.keys()[:-size]:
+        del cache[old_key]
+
+def channel_key(channel_index, channel_property):
+    '''
+    Hashable key of the rendered channel. Floats are rounded so that values
+    computed in different ways (slider steps) match.
+    '''
+    def freeze(obj):
+        if isinstance(obj, dict):
+            return tuple(sorted((key, freeze(val)) for key, val in obj.items()))
+        if isinstance(obj, (list, tuple)):
+            return tuple(freeze(item) for item in obj)
+        if isinstance(obj, float):
+            return round(obj, 9)
+        return obj
+    return (channel_index, freeze(channel_property['pipeline']), channel_property['color'])
+
+
+class RenderState(object):
+    '''
+    Renderer's copy of the channel properties. Updated by versioned render
+    tasks that are either full (carry all channel properties) or carry only
+    the changed channels and filters.
+    '''
+
+    def __init__(self):
+        self.channel_properties = []
+        self.version = None
+        ## Channels changed since the last render
+        self.dirty = set()
+        ## Filter changes since the last render as tuples (channel index,
+        ## filter index, old filter dict, new filter dict). None stands for
+        ## other changes.
+        self.edits = []
+        self.resync_needed = False
+        ## Time of the oldest change not rendered yet
+        self.timestamp = float('inf')
+        ## Last single step of the edited parameter as tuple (channel index,
+        ## filter index, parameter name, change), if known
+        self.step = None
+
+    def apply(self, task):
+        if task.get('full', False):
+            self.channel_properties = task['channel_properties']
+            self.dirty = set(range(len(self.channel_properties)))
+            self.edits.append(None)
+            self.version = task['version']
+            self.resync_needed = False
+            return
+
+        ## A task was missed. Wait for a full one.
+        if self.resync_needed or task['base_version'] != self.version:
+            self.resync_needed = True
+            return
+
+        self.version = task['version']
+        self.step = task.get('step', None)
+        for channel_index, channel_property in task.get('channels', {}).items():
+            if channel_index >= len(self.channel_properties):
+                self.resync_needed = True
+                return
+            self.channel_properties[channel_index] = channel_property
+            self.dirty.add(channel_index)
+            self.edits.append(None)
+        for (channel_index, filter_index), filter_dict in task.get('filters', {}).items():
+            filters = self.channel_properties[channel_index]['pipeline']['filters']
+            self.edits.append((channel_index, filter_index, filters[filter_index], filter_dict))
+            filters[filter_index] = filter_dict
+            self.dirty.add(channel_index)
+
+    def rendered(self):
+        '''
+        Marks the current state as rendered.
+        '''
+        self.dirty = set()
+        self.edits = []
+        self.timestamp = float('inf')
+        self.step = None
+
+
+def find_edited_parameter(edits, channel_properties, step=None):
+    '''
+    Finds the parameter being edited from the changes since the last render.
+    Changes collected over several slider events add up, so the change is
+    taken from the last single step if it is known.
+
+    # Arguments:
+        - edits: list of changes, see RenderState.edits.
+        - channel_properties: list of current channel properties.
+        - step: tuple (channel index, filter index, parameter name, change),
+            optional. Last single step, see RenderState.step.
+
+    # Returns:
+        - tuple (channel index, filter index, parameter name, change) if the
+            only change is of one numerical filter parameter of a visible
+            channel. Otherwise None.
+    '''
+    if len(edits) == 0 or None in edits:
+        return None
+    channel_index, filter_index, old_filter, _ = edits[0]
+    new_filter = edits[-1][3]
+    if any(edit[:2] != (channel_index, filter_index) for edit in edits):
+        return None
+    if not channel_properties[channel_index]['visible'] or old_filter['name'] != new_filter['name']:
+        return None
+    changed = [key for key in new_filter['params']
+               if old_filter['params'].get(key) != new_filter['params'][key]]
+    if len(changed) != 1:
+        return None
+    old_value = old_filter['params'].get(changed[0])
+    new_value = new_filter['params'][changed[0]]
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool)
+               for value in (old_value, new_value)):
+        return None
+    if step is not None and step[:3] == (channel_index, filter_index, changed[0]) and step[3] != 0:
+        return step
+    return (channel_index, filter_index, changed[0], new_value - old_value)
+
+
+def plan_speculation(state):
+    '''
+    Returns speculative render jobs for the neighbouring values of the edited
+    parameter (see neighbour_properties). None are planned if the edited
+    filter or any later one is expensive: speculation is only abandoned
+    between filters, so it would delay the next real task.
+
+    # Arguments:
+        - state: RenderState with the changes since the last render.
+    '''
+    edit = find_edited_parameter(state.edits, state.channel_properties, state.step)
+    if edit is None:
+        return []
+    channel_index, filter_index = edit[:2]
+    for filter_dict in state.channel_properties[channel_index]['pipeline']['filters'][filter_index:]:
+        if filter_dict['params'].get('active', True) and get_filter_by_name(filter_dict['name']).expensive:
+            return []
+    return neighbour_properties(state.channel_properties, *edit)
+
+
+def neighbour_properties(channel_properties, channel_index, filter_index, param, change):
+    '''
+    Returns properties of the channel with the edited parameter moved by one
+    more step in the direction of the change and one step back.
+
+    # Returns:
+        - list of tuples (channel index, channel properties)
+    '''
+    result = []
+    value = channel_properties[channel_index]['pipeline']['filters'][filter_index]['params'][param]
+    for new_value in (value + change, value - change):
+        channel_property = copy.deepcopy(channel_properties[channel_index])
+        channel_property['pipeline']['filters'][filter_index]['params'][param] = new_value
+        result.append((channel_index, channel_property))
+    return result
+
+
 def render_response(input_image, output_image, cmap):
     from skimage.transform import resize
     response = np.empty((128,256,4))
@@ -0,0 +1,244 @@
+# ------------------------------------------------------------------------------
+#  File: thumbnails.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Background rendering of thumbnails of image files with a disk cache
+# ------------------------------------------------------------------------------
+
+import os
+import json
+import hashlib
+import threading
+import traceback
+import numpy as np
+import happy as hp
+from PIL import Image
+from queue import Queue, Empty
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .filters import cache_manager
+    from .filters.pipeline import Pipeline
+    from .filters.backend import NumpyBackend
+    from .utils.notifier import notify
+except ImportError:
+    from filters import cache_manager
+    from filters.pipeline import Pipeline
+    from filters.backend import NumpyBackend
+    from utils.notifier import notify
+
+## Longest side of thumbnails in pixels
+thumbnail_size = 96
+## Directory of the disk cache of rendered thumbnails
+cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'image_viewer_mk2', 'thumbnails')
+## Size limit of the disk cache in bytes. Least recently used thumbnails are
+## deleted when a request finishes.
+cache_max_bytes = 256 * 2**20
+## Memory budget for cached intermediate results of each worker process
+worker_cache_budget = 256 * 2**20
+
+class Thumbnails(object):
+    '''
+    Renders thumbnails of image files with given channel properties in a pool
+    of background processes. Finished thumbnails are collected in a queue and
+    announced through the sending end of a Notifier with tag b'thumbnail'.
+    '''
+
+    def __init__(self, notify_sender=None, n_workers=None):
+        self.notify_sender = notify_sender
+        self.n_workers = n_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.pool = None
+        self.futures = []
+        self.results = Queue()
+        self.n_pending = 0
+        self.lock = threading.Lock()
+
+    def request(self, filenames, channel_properties):
+        '''
+        Starts rendering thumbnails of the files (in given order). Pending
+        thumbnails of a previous request are cancelled.
+
+        # Arguments:
+            - filenames: list of str.
+            - channel_properties: plain list of channel properties.
+        '''
+        self.cancel()
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.n_workers,
+                                            initializer=_init_worker,
+                                            initargs=(worker_cache_budget,))
+        with self.lock:
+            self.n_pending += len(filenames)
+        for filename in filenames:
+            future = self.pool.submit(render_thumbnail, filename, channel_properties)
+            future.add_done_callback(lambda future, filename=filename: self._done(filename, future))
+            self.futures.append(future)
+
+    def _done(self, filename, future):
+        with self.lock:
+            self.n_pending -= 1
+            finished = self.n_pending == 0
+        if finished:
+            trim_cache()
+        if future.cancelled():
+            return
+        try:
+            thumbnail = future.result()
+        except Exception:
+            thumbnail = None
+        self.results.put((filename, thumbnail))
+        notify(self.notify_sender, b'thumbnail')
+
+    def read(self):
+        '''
+        Returns list of finished thumbnails as tuples (filename, uint8 array or
+        None if the file could not be rendered).
+        '''
+        results = []
+        try:
+            while True:
+                results.append(self.results.get_nowait())
+        except Empty:
+            pass
+        return results
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    def close(self):
+        self.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+
+def _init_worker(cache_budget):
+    ## Thumbnails must not slow down rendering of the shown image
+    if hasattr(os, 'nice'):
+        os.nice(5)
+    cache_manager.get_manager().budget = cache_budget
+
+
+def render_thumbnail(filename, channel_properties, size=None):
+    '''
+    Renders a thumbnail of an image file, reading it from the disk cache if
+    it was rendered before with the same channel properties.
+
+    # Returns:
+        - uint8 array of shape (height, width, 4).
+    '''
+    if size is None:
+        size = thumbnail_size
+    path = thumbnail_path(filename, channel_properties, size)
+    if os.path.isfile(path):
+        thumbnail = np.array(Image.open(path))
+        ## Modification time marks the last use, see trim_cache
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return thumbnail
+
+    image = read_strided(filename, size)
+    thumbnail = render_image(image, channel_properties)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        Image.fromarray(thumbnail).save(path)
+    except OSError:
+        traceback.print_exc()
+    return thumbnail
+
+
+def trim_cache(max_bytes=None):
+    '''
+    Deletes the least recently used thumbnails (by modification time) until
+    the disk cache fits into max_bytes (cache_max_bytes by default).
+    '''
+    if max_bytes is None:
+        max_bytes = cache_max_bytes
+    try:
+        entries = [entry for entry in os.scandir(cache_dir)
+                   if entry.is_file() and entry.name.endswith('.png')]
+    except OSError:
+        return
+    stats = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+            stats.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+    size = sum(file_size for _, file_size, _ in stats)
+    for _, file_size, path in sorted(stats):
+        if size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            size -= file_size
+        except OSError:
+            pass
+
+
+def thumbnail_path(filename, channel_properties, size):
+    '''
+    Returns path of the cached thumbnail. The name hashes the file, its
+    modification time, the size and the channel properties.
+    '''
+    filename = os.path.abspath(filename)
+    key = json.dumps([filename, os.path.getmtime(filename), size, channel_properties],
+                     sort_keys=True, default=str)
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.png')
+
+
+def read_strided(filename, size):
+    '''
+    Reads an image subsampled so that its longest side is about size pixels.
+    NumPy files are memory-mapped and only the sampled pixels are read.
+
+    NOTE: Other formats (NIfTI, MAT, NRRD) are decoded in full by hp.io.load,
+          which has no reduced-resolution read, and subsampled afterwards.
+          Rendered thumbnails are cached on disk, so each file is decoded
+          once per channel properties.
+    '''
+    try:
+        from .model import load_image_internal
+    except ImportError:
+        from model import load_image_internal
+
+    if not filename.lower().endswith('.npy'):
+        image = load_image_internal(filename)
+    else:
+        ## Same axis interpretation as load_image_internal
+        image = np.load(filename, mmap_mode='r')
+        if image.ndim == 2:
+            image = image[...,None]
+        if np.argmin(image.shape) != 2:
+            image = np.swapaxes(image, np.argmin(image.shape), 2)
+
+    step = max(1, int(np.ceil(max(image.shape[:2]) / size)))
+    return np.array(image[::step, ::step])
+
+
+def render_image(image, channel_properties):
+    '''
+    Renders an image with given channel properties in the calling process,
+    the same way as the renderer does.
+
+    # Returns:
+        - uint8 array of shape (height, width, 4).
+    '''
+    layers = []
+    for channel_index, channel_property in enumerate(channel_properties[:image.shape[2]]):
+        if not channel_property['visible']:
+            continue
+        channel = image[...,channel_index].astype(float)
+        mn, mx = channel.min(), channel.max()
+        channel = (channel-mn)/(mx-mn) if mx > mn else np.zeros_like(channel)
+        output = Pipeline.deserialize(channel_property['pipeline'])(channel)
+        layers.append(hp.plots.cmap('k', channel_property['color'])(output))
+    if len(layers) == 0:
+        layers = [np.zeros(image.shape[:2] + (4,))]
+    return NumpyBackend().composite(layers)
@@ -205,8 +205,11 @@ class AnisotropicDenoisingConfig(FilterConfig):
         self.vars['step_size'] = DoubleVar(value=0.15)
         self.vars['sensitivity'] = DoubleVar(value=.1)
         self.vars['n_iter'] = IntVar(value=10)
+        self.vars['tolerance'] = DoubleVar(value=0)
 
         self._setup_slider('Conductivity', self.vars['sensitivity'], 0.01, 1, .01)
         self._setup_slider('# iterations', self.vars['n_iter'], 1, 20, 1)
         ## Step size slides is hidden
         # self._setup_slider('Step size', self.vars['step_size'], 0, .25, 0.01)
+        ## Early stopping tolerance is hidden
+        # self._setup_slider('Tolerance', self.vars['tolerance'], 0, .01, 0.0005)
@@ -60,6 +60,21 @@ class LoaderAnimation(object):
 
     def hide(self):
         self._is_playing = False
+        self.set_progress(None)
+
+    def set_progress(self, progress):
+        '''
+        Shows a progress bar under the animation.
+
+        # Arguments:
+        - `progress`: float between 0 and 1, or None to hide the bar.
+        '''
+        self.tk_canvas.delete('loader_progress')
+        if progress is None:
+            return
+        x = self.tk_canvas.winfo_width()/2 - 70
+        y = self.tk_canvas.winfo_height()/2 + 36
+        self.tk_canvas.create_rectangle(x, y, x + 140*progress, y+3, fill='#888888', width=0, tags='loader_progress')
 
     def _update(self):
         frame = self.frames[self._active_frame]
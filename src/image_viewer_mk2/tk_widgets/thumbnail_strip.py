@@ -0,0 +1,95 @@
+# ------------------------------------------------------------------------------
+#  File: thumbnail_strip.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Viewer component for browsing thumbnails of the images in a folder
+# ------------------------------------------------------------------------------
+
+import os
+import tkinter as tk
+import tkinter.ttk as ttk
+from PIL import Image, ImageTk
+
+try:
+    from .scrolled_frame import ScrolledFrame
+except ImportError:
+    from tk_widgets.scrolled_frame import ScrolledFrame
+
+class ThumbnailStrip():
+    '''
+    Scrollable list of thumbnails of image files. Hidden by default.
+    '''
+
+    def __init__(self, parent_frame, skin):
+        self.skin = skin
+        self.filenames = []
+        self.items = {}
+        self.on_select = None
+        self.visible = False
+
+        self.mainframe = ttk.LabelFrame(parent_frame, text='Folder', padding=5)
+
+        self.wrap_frame = ScrolledFrame(self.mainframe, bg=self.skin.bg_color,
+                                        use_ttk=True, scrollbars='vertical',
+                                        borderwidth=0, relief=tk.FLAT,
+                                        width=200, height=600)
+        self.wrap_frame.pack(side=tk.TOP, expand=True, fill=tk.BOTH, padx=0, pady=0)
+        self.wrap_frame.bind_scroll_wheel(self.mainframe)
+        self.wrap_frame.bind_scroll_wheel(self.wrap_frame)
+        self.items_frame = None
+
+        footer_frame = tk.Frame(self.mainframe, bg=self.skin.bg_color)
+        footer_frame.pack(side=tk.BOTTOM, expand=False, fill=tk.X, padx=0, pady=0)
+        self.btn_refresh = ttk.Button(footer_frame, text='Refresh')
+        self.btn_refresh.pack(side=tk.LEFT, expand=False, padx=5, pady=5)
+
+    def show(self):
+        self.mainframe.pack(side=tk.TOP, expand=True, fill=tk.BOTH, padx=5, pady=5)
+        self.visible = True
+
+    def hide(self):
+        self.mainframe.pack_forget()
+        self.visible = False
+
+    def set_files(self, filenames, current=None):
+        '''
+        Creates an item for every file. Thumbnails are added by
+        update_thumbnails.
+        '''
+        self.filenames = list(filenames)
+        self.items = {}
+        self.items_frame = self.wrap_frame.display_widget(tk.Frame, fit_width=True, bg=self.skin.bg_color)
+        for filename in self.filenames:
+            item = tk.Label(self.items_frame, text=os.path.basename(filename), compound=tk.TOP,
+                            fg=self.skin.fg_color, bg=self.skin.bg_color, anchor=tk.N,
+                            highlightthickness=2, highlightbackground=self.skin.bg_color)
+            item.pack(side=tk.TOP, expand=True, fill=tk.X, padx=0, pady=2)
+            item.bind('<Button-1>', lambda _, filename=filename: self.select(filename))
+            self.wrap_frame.bind_scroll_wheel(item)
+            self.items[filename] = item
+        self.set_current(current)
+
+    def update_thumbnails(self, thumbnails):
+        '''
+        Shows thumbnails of the items.
+
+        # Arguments:
+            - thumbnails: dict of uint8 arrays (or None) keyed by filenames.
+        '''
+        for filename, thumbnail in thumbnails.items():
+            item = self.items.get(filename, None)
+            if item is None or thumbnail is None or getattr(item, 'thumbnail', None) is thumbnail:
+                continue
+            item.thumbnail = thumbnail
+            item.image = ImageTk.PhotoImage(Image.fromarray(thumbnail))
+            item.config(image=item.image)
+
+    def set_current(self, filename):
+        for item_filename, item in self.items.items():
+            color = self.skin.fg_color if item_filename == filename else self.skin.bg_color
+            item.config(highlightbackground=color)
+
+    def select(self, filename):
+        if self.on_select is not None:
+            self.on_select(filename)
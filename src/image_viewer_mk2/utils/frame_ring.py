@@ -0,0 +1,121 @@
+# ------------------------------------------------------------------------------
+#  File: frame_ring.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Shared memory transport of rendered frames between processes
+# ------------------------------------------------------------------------------
+
+import os
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError: # for Python<3.8
+    shared_memory = None
+
+class FrameWriter(object):
+    '''
+    Writing end of a ring of shared memory slots for rendered frames. A frame
+    is a list of arrays, written to the next slot. Only a small descriptor is
+    sent to the reading process, which maps the arrays without copying.
+
+    With two slots (double buffering) a slot is reused only after a newer
+    frame was received, which holds as long as there is at most one render
+    task outstanding (see Model.update_render).
+
+    If shared memory is not available, the descriptor carries the arrays.
+    '''
+
+    def __init__(self, n_slots=2):
+        self.n_slots = n_slots
+        self.slots = [None] * n_slots
+        self.next_slot = 0
+
+    def write(self, arrays):
+        '''
+        Copies arrays to the next slot.
+
+        # Returns:
+            - frame descriptor to be passed to FrameReader.read.
+        '''
+        arrays = [np.ascontiguousarray(array) for array in arrays]
+        if shared_memory is None:
+            return {'arrays': arrays}
+
+        layout = []
+        size = 0
+        for array in arrays:
+            layout.append((array.shape, array.dtype.str, size))
+            ## Keep arrays aligned
+            size += -(-array.nbytes // 64) * 64
+
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.n_slots
+        try:
+            if self.slots[slot] is None or self.slots[slot].size < size:
+                self.release(slot)
+                self.slots[slot] = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        except OSError:
+            return {'arrays': arrays}
+
+        buffer = self.slots[slot].buf
+        for array, (shape, dtype, offset) in zip(arrays, layout):
+            np.copyto(np.ndarray(shape, dtype, buffer, offset), array)
+        return {'slot': slot, 'name': self.slots[slot].name, 'layout': layout}
+
+    def release(self, slot):
+        if self.slots[slot] is not None:
+            self.slots[slot].close()
+            self.slots[slot].unlink()
+            self.slots[slot] = None
+
+    def close(self):
+        for slot in range(self.n_slots):
+            self.release(slot)
+
+
+class FrameReader(object):
+    '''
+    Reading end of a FrameWriter. Has to be created before the writing
+    process is started.
+    '''
+
+    def __init__(self):
+        ## Attached shared memory blocks of each slot
+        self.slots = {}
+        ## Processes started afterwards share the resource tracker, so blocks
+        ## unlinked by the writer are not reported as leaked by the reader
+        if shared_memory is not None and os.name == 'posix':
+            resource_tracker.ensure_running()
+
+    def read(self, frame):
+        '''
+        Returns the list of arrays of a frame. Arrays map the shared memory
+        and are valid until the writer reuses the slot.
+        '''
+        if 'arrays' in frame:
+            return frame['arrays']
+
+        block = self.slots.get(frame['slot'], None)
+        if block is None or block.name != frame['name']:
+            if block is not None:
+                self.detach(block)
+            block = shared_memory.SharedMemory(name=frame['name'])
+            self.slots[frame['slot']] = block
+
+        return [np.ndarray(shape, dtype, block.buf, offset)
+                for shape, dtype, offset in frame['layout']]
+
+    @staticmethod
+    def detach(block):
+        try:
+            block.close()
+        except BufferError:
+            ## Arrays still map the block. It is closed when they are freed.
+            pass
+
+    def close(self):
+        for block in self.slots.values():
+            self.detach(block)
+        self.slots = {}
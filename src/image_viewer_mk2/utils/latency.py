@@ -0,0 +1,60 @@
+# ------------------------------------------------------------------------------
+#  File: latency.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Recording of input-to-display latency
+# ------------------------------------------------------------------------------
+
+import json
+import numpy as np
+from collections import deque
+
+class LatencyMonitor(object):
+    '''
+    Keeps latencies of recent frames, i.e. times from the change of the model
+    to the display of the frame rendered from it.
+    '''
+
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+
+    def add(self, sequence, latency):
+        '''
+        Records latency of a frame.
+
+        # Arguments:
+            - sequence: int. Sequence id (render version) of the frame.
+            - latency: float. Latency in seconds.
+        '''
+        self.samples.append((sequence, latency))
+
+    def percentiles(self, q=(50, 95, 99)):
+        '''
+        Returns dict of latency percentiles in seconds, keyed 'p50' etc.
+        Empty if nothing was recorded.
+        '''
+        if len(self.samples) == 0:
+            return {}
+        latencies = np.array([latency for _, latency in self.samples])
+        return {f'p{p}': float(np.percentile(latencies, p)) for p in q}
+
+    def summary(self):
+        '''
+        Returns one line text summary in milliseconds.
+        '''
+        percentiles = self.percentiles()
+        if len(percentiles) == 0:
+            return 'latency: -'
+        values = ' '.join(f'{key} {1000*value:.0f}' for key, value in percentiles.items())
+        return f'latency [ms]: {values} (n={len(self.samples)})'
+
+    def dump(self, filename):
+        '''
+        Saves the percentiles and all recorded samples to a JSON file.
+        '''
+        data = {'percentiles': self.percentiles(),
+                'samples': [{'sequence': sequence, 'latency': latency}
+                            for sequence, latency in self.samples]}
+        with open(filename, 'w') as file:
+            json.dump(data, file, indent=2)
@@ -0,0 +1,90 @@
+# ------------------------------------------------------------------------------
+#  File: notifier.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Notifications from worker processes waking up the Tk event loop
+# ------------------------------------------------------------------------------
+
+import os
+import threading
+import tkinter as tk
+from multiprocessing import Pipe
+from queue import Queue, Empty
+
+class Notifier(object):
+    '''
+    Pipe through which worker processes signal that they have put a result
+    in their queue. The receiving end is watched by the Tk event loop, so
+    results are handled as soon as they are ready without polling.
+
+    Worker processes get the sending end (Notifier.sender) and call notify()
+    on it. Each notification is a short tag identifying the sender.
+    '''
+
+    def __init__(self):
+        self.receiver, self.sender = Pipe(duplex=False)
+
+    def read(self):
+        '''
+        Returns tags of all pending notifications without blocking.
+        '''
+        tags = []
+        while self.receiver.poll():
+            tags.append(self.receiver.recv_bytes())
+        return tags
+
+    def watch(self, widget, callback):
+        '''
+        Calls callback(tags) from the Tk event loop of given widget whenever
+        notifications arrive.
+
+        On POSIX systems the pipe is watched by Tk directly. Elsewhere (Tk on
+        Windows can't watch pipes) a thread waits for the notifications and
+        wakes up the event loop with a virtual event.
+        '''
+        if os.name == 'posix' and hasattr(widget.tk, 'createfilehandler'):
+            def on_readable(*_):
+                tags = self.read()
+                if len(tags) > 0:
+                    callback(tags)
+            widget.tk.createfilehandler(self.receiver.fileno(), tk.READABLE, on_readable)
+            return
+
+        received = Queue()
+        def wait():
+            while True:
+                try:
+                    received.put(self.receiver.recv_bytes())
+                except (EOFError, OSError):
+                    break
+                try:
+                    widget.event_generate('<<Notification>>', when='tail')
+                except (tk.TclError, RuntimeError):
+                    ## Main loop has ended
+                    break
+
+        def on_notification(*_):
+            tags = []
+            try:
+                while True:
+                    tags.append(received.get_nowait())
+            except Empty:
+                pass
+            if len(tags) > 0:
+                callback(tags)
+
+        widget.bind('<<Notification>>', on_notification)
+        threading.Thread(target=wait, daemon=True).start()
+
+
+def notify(sender, tag):
+    '''
+    Sends a notification through the sending end of a Notifier.
+
+    # Arguments:
+        - sender: Notifier.sender connection.
+        - tag: bytes. Identifies the kind of notification.
+    '''
+    if sender is not None:
+        sender.send_bytes(tag)
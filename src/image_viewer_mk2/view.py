@@ -30,6 +30,7 @@ try:
     from .tk_widgets.limiter import Limiter
     from .tk_widgets.loader_animation import LoaderAnimation
     from .tk_widgets.channels_list import ChannelsList
+    from .tk_widgets.thumbnail_strip import ThumbnailStrip
     from .tk_widgets.panel_pipelines import PanelPipelines
     from .tk_widgets.window_about import WindowAbout
     from .utils.tk_call_wrapper import CallWrapper
@@ -42,6 +43,7 @@ except ImportError:
     from tk_widgets.limiter import Limiter
     from tk_widgets.loader_animation import LoaderAnimation
     from tk_widgets.channels_list import ChannelsList
+    from tk_widgets.thumbnail_strip import ThumbnailStrip
     from tk_widgets.window_about import WindowAbout
     from utils.tk_call_wrapper import CallWrapper
     from tk_widgets import filter_config
@@ -77,6 +79,15 @@ class View(tk.Tk):
         self.zoom = 1
         self.offset = (0,0)
 
+        ## Shown image and its drawn part, see show_image
+        self.image = None
+        self.mipmaps = []
+        self.image_item = None
+        self.render_ref = None
+        self.render_mode = None
+        self.drawn = None
+        self.settle_job = None
+
         if skin is None:
             skin = skin_.Skin()
         self.skin = skin
@@ -85,6 +96,7 @@ class View(tk.Tk):
             debug = False
         if not debug:
             tk.CallWrapper = CallWrapper
+        self.debug = debug
 
         self.window_about = None
 
@@ -103,6 +115,7 @@ class View(tk.Tk):
         self.figure_canvas.bind('<B1-Motion>', self.mouse1_drag)
         self.figure_canvas.bind('<Button-3>', self.mouse2_drag)
         self.figure_canvas.bind('<B3-Motion>', self.mouse2_drag)
+        self.figure_canvas.bind('<Configure>', lambda _,self=self:self.show_image(interactive=True))
 
         ## -- bind keyboard
         self.bind('+', lambda _,self=self:self.set_zoom(self.zoom+.5))
@@ -131,6 +144,10 @@ class View(tk.Tk):
         self.menu['file'] = {'obj': tk.Menu(self.menu['obj'])}
         self.menu['file']['load_image'] = 'Load image... (Ctrl+O)'
         self.menu['file']['obj'].add_command(label=self.menu['file']['load_image'])
+        self.menu['file']['previous_file'] = 'Previous file (PgUp)'
+        self.menu['file']['obj'].add_command(label=self.menu['file']['previous_file'])
+        self.menu['file']['next_file'] = 'Next file (PgDn)'
+        self.menu['file']['obj'].add_command(label=self.menu['file']['next_file'])
         self.menu['file']['save_render'] = 'Save image... (Ctrl+S)'
         self.menu['file']['obj'].add_command(label=self.menu['file']['save_render'])
         self.menu['file']['load_config'] = 'Load configuration'
@@ -139,6 +156,15 @@ class View(tk.Tk):
         self.menu['file']['obj'].add_command(label=self.menu['file']['save_config'])
         self.menu['obj'].add_cascade(label="File", menu=self.menu['file']['obj'])
 
+        self.menu['edit'] = {'obj': tk.Menu(self.menu['obj'])}
+        self.menu['edit']['undo'] = 'Undo (Ctrl+Z)'
+        self.menu['edit']['obj'].add_command(label=self.menu['edit']['undo'])
+        self.menu['edit']['redo'] = 'Redo (Ctrl+Y)'
+        self.menu['edit']['obj'].add_command(label=self.menu['edit']['redo'])
+        self.menu['edit']['toggle_ab'] = 'Compare with previous (Ctrl+B)'
+        self.menu['edit']['obj'].add_command(label=self.menu['edit']['toggle_ab'])
+        self.menu['obj'].add_cascade(label="Edit", menu=self.menu['edit']['obj'])
+
         self.menu['image'] = {'obj': tk.Menu(self.menu['obj'])}
         self.menu['image']['transpose'] = 'Transpose (Ctrl+T)'
         self.menu['image']['obj'].add_command(label=self.menu['image']['transpose'])
@@ -153,6 +179,11 @@ class View(tk.Tk):
         self.menu['view']['obj'].add_command(label=self.menu['view']['zoomin'], command=lambda self=self:self.set_zoom(self.zoom+.5))
         self.menu['view']['zoomout'] = 'Zoom out (-)'
         self.menu['view']['obj'].add_command(label=self.menu['view']['zoomout'], command=lambda self=self:self.set_zoom(self.zoom-.25))
+        self.menu['view']['browse'] = 'Browse folder (Ctrl+F)'
+        self.menu['view']['obj'].add_command(label=self.menu['view']['browse'])
+        if self.debug:
+            self.menu['view']['save_latency'] = 'Save latency log...'
+            self.menu['view']['obj'].add_command(label=self.menu['view']['save_latency'])
         self.menu['obj'].add_cascade(label="View", menu=self.menu['view']['obj'])
 
         self.menu['about'] = 'About'
@@ -222,6 +253,7 @@ class View(tk.Tk):
 
     def setup_channels2_panel(self):
         self.channels_panel = ChannelsList(self.grid_frames[1],self.skin, self.var_selected_channel)
+        self.thumbnail_strip = ThumbnailStrip(self.grid_frames[1], self.skin)
 
 
     def setup_response_panel(self):
@@ -254,21 +286,141 @@ class View(tk.Tk):
         return asksaveasfilename_(*args, **kwargs)
 
 
-    def show_image(self, image=None):
+    ## Milliseconds after the last interaction before the image is redrawn in
+    ## high quality
+    settle_delay = 150
+
+    def image_origin(self):
+        '''
+        Returns canvas coordinates of the top left corner of the zoomed image.
+        '''
+        canvas_width = self.figure_canvas.winfo_width()
+        canvas_height = self.figure_canvas.winfo_height()
+        return (canvas_width/2 + self.offset[0] - self.image.size[0]*self.zoom/2,
+                canvas_height/2 + self.offset[1] - self.image.size[1]*self.zoom/2)
+
+    def visible_region(self, margin=0):
+        '''
+        Returns the part of the image visible on the canvas, extended by
+        margin canvas pixels on each side, as pixel box (left, top, right,
+        bottom). None if no part of the image is visible.
+        '''
+        left, top = self.image_origin()
+        canvas_size = (self.figure_canvas.winfo_width(), self.figure_canvas.winfo_height())
+        box = []
+        for origin, canvas_extent, image_extent in zip((left, top), canvas_size, self.image.size):
+            box.append(max(0, int(np.floor((-margin - origin) / self.zoom))))
+            box.append(min(image_extent, int(np.ceil((canvas_extent + margin - origin) / self.zoom))))
+        x0, x1, y0, y1 = box
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def show_image(self, image=None, interactive=False):
+        '''
+        Draws the image on the canvas. Only the visible part (with a margin for
+        panning) is resized. The canvas item and the photo image are reused.
+
+        # Arguments:
+            - image: PIL image, optional. New image to show. If None, the
+                current image is redrawn.
+            - interactive: bool. If True, fast nearest neighbour resampling is
+                used and a high quality redraw follows once the interaction
+                stops.
+        '''
         if image is not None:
             self.image = image
+            self.mipmaps = [image]
+        if self.image is None:
+            return
+
+        if self.settle_job is not None:
+            self.after_cancel(self.settle_job)
+            self.settle_job = None
+        if interactive:
+            self.settle_job = self.after(self.settle_delay, self.show_image)
+
+        if self.image_item is None:
+            self.image_item = self.figure_canvas.create_image((0,0), anchor=tk.NW)
+            self.figure_canvas.tag_lower(self.image_item)
+
+        margin = max(self.figure_canvas.winfo_width(), self.figure_canvas.winfo_height()) / 2
+        box = self.visible_region(margin)
+        if box is None:
+            self.figure_canvas.itemconfigure(self.image_item, state=tk.HIDDEN)
+            self.drawn = None
+            return
+
+        ## Zoomed out views are resized from the closest larger mipmap
+        level = int(np.floor(np.log2(1 / self.zoom))) if self.zoom < 1 else 0
+        factor = 2**level
+        box = (box[0] // factor, box[1] // factor, -(-box[2] // factor), -(-box[3] // factor))
+        crop = self.mipmap(level).crop(box)
+        box = tuple(coord * factor for coord in box)
+        scale = self.zoom * factor
+        if scale != 1:
+            size = (max(1, round(crop.size[0]*scale)), max(1, round(crop.size[1]*scale)))
+            crop = crop.resize(size, Image.NEAREST if interactive else Image.BICUBIC)
+
+        ## Update the photo in place if possible
+        if (self.render_ref is not None and self.render_mode == crop.mode
+            and (self.render_ref.width(), self.render_ref.height()) == crop.size):
+            self.render_ref.paste(crop)
+        else:
+            self.render_ref = ImageTk.PhotoImage(crop)
+            self.render_mode = crop.mode
+            self.figure_canvas.itemconfigure(self.image_item, image=self.render_ref)
+
+        self.drawn = box, self.zoom
+        self.place_image()
+        self.figure_canvas.itemconfigure(self.image_item, state=tk.NORMAL)
+        self.figure_canvas.tag_raise('overlay')
 
-        if self.zoom != 1:
-            image = self.image.resize((int(self.image.size[0]*self.zoom),
-                                       int(self.image.size[1]*self.zoom)))
+    def mipmap(self, level):
+        '''
+        Returns the image downsampled 2**level times. Levels are built on
+        first use by 2x2 averaging of the previous level and kept until the
+        image changes.
+        '''
+        while len(self.mipmaps) <= level:
+            self.mipmaps.append(self.mipmaps[-1].reduce(2))
+        return self.mipmaps[level]
+
+    def place_image(self):
+        '''
+        Moves the drawn part of the image to its position on the canvas.
+        '''
+        left, top = self.image_origin()
+        (x0, y0, _, _), zoom = self.drawn
+        self.figure_canvas.coords(self.image_item, left + x0*zoom, top + y0*zoom)
+
+    def pan_image(self):
+        '''
+        Moves the drawn image after the offset changed. The image is redrawn
+        only if a part of the visible area was not drawn.
+        '''
+        if self.image is None:
+            return
+        box = self.visible_region()
+        if self.drawn is not None and box is not None and self.drawn[1] == self.zoom:
+            drawn_box = self.drawn[0]
+            if (drawn_box[0] <= box[0] and drawn_box[1] <= box[1]
+                and drawn_box[2] >= box[2] and drawn_box[3] >= box[3]):
+                self.place_image()
+                return
+        self.show_image(interactive=True)
+
+    def show_overlay(self, text):
+        '''
+        Shows debug text over the top left corner of the image.
+        '''
+        items = self.figure_canvas.find_withtag('overlay')
+        if len(items) == 0:
+            self.figure_canvas.create_text((5,5), text=text, anchor=tk.NW, fill='#ffff00',
+                                           font=('TkFixedFont', 9), tags='overlay')
         else:
-            image = self.image
-        self.render_ref = ImageTk.PhotoImage(image)
-        # self.figure_canvas.update()
-        canvas_width = self.figure_canvas.winfo_width()
-        canvas_height = self.figure_canvas.winfo_height()
-        # print(canvas_width, canvas_height)
-        self.figure_canvas.create_image((canvas_width/2+self.offset[0],canvas_height/2+self.offset[1]), image=self.render_ref)
+            self.figure_canvas.itemconfigure(items[0], text=text)
+        self.figure_canvas.tag_raise('overlay')
 
     def show_response(self, response_image):
         if not response_image is None:
@@ -305,7 +457,7 @@ class View(tk.Tk):
         else:
             self.offset = (event.x - self.offset_root[0] + self.orig_offset[0],
                            event.y - self.offset_root[1] + self.orig_offset[1])
-            self.show_image()
+            self.pan_image()
 
     def mouse2_drag(self, event):
         '''
@@ -317,11 +469,11 @@ class View(tk.Tk):
         else:
             distance = (self.zoom_root[1] - event.y) / 200
             activation = 1 + max(0, distance) + min(0, distance/2)
-            self.set_zoom(self.orig_zoom * activation)
+            self.set_zoom(self.orig_zoom * activation, interactive=True)
 
-    def set_zoom(self, zoom):
-        self.zoom = np.maximum(np.minimum(8, zoom),1/2)
-        self.show_image()
+    def set_zoom(self, zoom, interactive=False):
+        self.zoom = np.maximum(np.minimum(8, zoom),1/8)
+        self.show_image(interactive=interactive)
 
     def reset_view(self, *args):
         self.zoom = 1
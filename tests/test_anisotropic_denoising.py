@@ -0,0 +1,93 @@
+# ------------------------------------------------------------------------------
+#  File: test_anisotropic_denoising.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  In-place anisotropic diffusion and resuming it from stored states
+# ------------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from image_viewer_mk2.filters import anisotropic_denoising as ad
+from image_viewer_mk2.filters import cache_manager
+from image_viewer_mk2.filters import chunked
+
+
+@pytest.fixture
+def image():
+    img = np.random.default_rng(0).random((67, 45))
+    img[20:40, 10:30] += 2
+    return img
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    cache_manager.get_manager().clear()
+    chunked.set_threads(4)
+    yield
+    cache_manager.get_manager().clear()
+
+
+@pytest.mark.parametrize('option', [1, 2])
+def test_inplace_matches_reference(image, option):
+    expected = ad.anisodiff(image, gamma=.15, kappa=.5, niter=12, option=option)
+    result, n_done = ad.anisodiff_inplace(image, gamma=.15, kappa=.5, niter=12, option=option)
+    assert n_done == 11
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-5 * np.ptp(image))
+
+
+def test_inplace_independent_of_bands(image):
+    single, _ = ad.anisodiff_inplace(image, .15, .5, 12, n_threads=1)
+    for n_threads in (2, 3, 7):
+        result, _ = ad.anisodiff_inplace(image, .15, .5, 12, n_threads=n_threads)
+        np.testing.assert_array_equal(result, single)
+
+
+def test_inplace_resumes(image):
+    expected, _ = ad.anisodiff_inplace(image, .15, .5, 12)
+    states = {}
+    ad.anisodiff_inplace(image, .15, .5, 12,
+                         callback=lambda k, state: states.setdefault(k, state.copy()))
+    result, n_done = ad.anisodiff_inplace(states[4], .15, .5, 12, start_iter=4)
+    assert n_done == 11
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize('n_iters', [[12, 20], [20, 12], [20, 7, 13], [1, 6, 11]])
+def test_diffuse_resumes_from_checkpoints(image, n_iters):
+    for n_iter in n_iters:
+        result = np.array(ad.diffuse(image, .15, .5, n_iter))
+        fresh, _ = ad.anisodiff_inplace(image, .15, .5, n_iter)
+        np.testing.assert_array_equal(result, fresh)
+
+
+def test_diffuse_converged(image, monkeypatch):
+    tolerance = 1e-3
+    full, n_done = ad.anisodiff_inplace(image, .15, .5, 200, tolerance=tolerance)
+    assert n_done < 199
+
+    np.testing.assert_array_equal(ad.diffuse(image, .15, .5, 200, tolerance), full)
+    ## More iterations return the converged state without computation
+    with monkeypatch.context() as patch:
+        patch.setattr(ad, 'anisodiff_inplace', None)
+        np.testing.assert_array_equal(ad.diffuse(image, .15, .5, 300, tolerance), full)
+
+    ## Fewer iterations than needed to converge are computed
+    fewer, _ = ad.anisodiff_inplace(image, .15, .5, n_done - 3, tolerance=tolerance)
+    np.testing.assert_array_equal(ad.diffuse(image, .15, .5, n_done - 3, tolerance), fewer)
+
+
+def converged_entries(manager):
+    return [entry for entry in manager.entries.values()
+            if isinstance(entry.key, tuple) and entry.key[-1] == ad.converged]
+
+
+def test_converged_state_is_tracked(image):
+    manager = cache_manager.get_manager()
+    ad.diffuse(image, .15, .5, 200, 1e-3)
+    assert len(converged_entries(manager)) == 1
+    assert converged_entries(manager)[0].nbytes > 0
+    manager.clear()
+    assert converged_entries(manager) == []
@@ -0,0 +1,25 @@
+# ------------------------------------------------------------------------------
+#  File: test_app.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Headless rendering through the app interface
+# ------------------------------------------------------------------------------
+
+import numpy as np
+
+from image_viewer_mk2 import app
+from image_viewer_mk2 import model
+
+
+def test_render_returns_slow_render(monkeypatch):
+    ## The render takes many poll intervals, the model must wait for it
+    monkeypatch.setattr(model.Model, 'exit_poll_interval', 1e-3)
+    image = np.random.default_rng(0).random((1500, 1500, 3))
+
+    result = app.render(image=image)
+
+    assert result is not None
+    assert result.shape == (1500, 1500, 4)
+    assert result.dtype == np.uint8
+    assert result[..., :3].any()
@@ -0,0 +1,90 @@
+# ------------------------------------------------------------------------------
+#  File: test_backend.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Parity of the compute backends with the reference NumPy backend
+# ------------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from image_viewer_mk2.filters import backend
+from image_viewer_mk2.filters import cache_manager
+from image_viewer_mk2.filters import chunked
+from image_viewer_mk2.filters import filter_factory
+
+## Backends compared with the NumPy backend. GPU backends are skipped on
+## machines without them.
+backend_names = ['threaded', 'cupy', 'torch']
+## Non-default parameters of filters whose defaults are (almost) identities
+filter_params = {'gamma_correction': {'gamma': 2.2},
+                 'gaussian_blur': {'sigma': 3},
+                 'unsharp_mask': {'strength': 1, 'kernel_size': 3}}
+
+
+@pytest.fixture(autouse=True)
+def several_threads():
+    ## Several threads, so that the threaded backend really splits the rows
+    chunked.set_threads(4)
+    yield
+    chunked.set_threads(None)
+    backend.set_backend(backend.ThreadedBackend())
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    img = ndimage.gaussian_filter(rng.random((300, 257)), 2)
+    img[100:180, 60:90] += 1
+    return (img - img.min()) / (img.max() - img.min())
+
+
+def get_backend_or_skip(name):
+    if name in ('cupy', 'torch'):
+        pytest.importorskip(name)
+    compute = backend.get_backend_by_name(name)
+    if compute.name != name:
+        pytest.skip(f'{name} backend is not available')
+    return compute
+
+
+def run_filter(T_filter, img, compute):
+    backend.set_backend(compute)
+    ## Shared caches would return the result of the previous backend
+    cache_manager.get_manager().clear()
+    return T_filter(**filter_params.get(T_filter.name, {}))(img)
+
+
+@pytest.mark.parametrize('name', backend_names)
+@pytest.mark.parametrize('T_filter', filter_factory.get_available_filters(),
+                         ids=lambda T_filter: T_filter.name)
+def test_filter_parity(name, T_filter, image):
+    compute = get_backend_or_skip(name)
+    reference = run_filter(T_filter, image, backend.NumpyBackend())
+    result = run_filter(T_filter, image, compute)
+    assert result.shape == reference.shape
+    np.testing.assert_allclose(result, reference, atol=1e-6)
+
+
+@pytest.mark.parametrize('name', backend_names)
+@pytest.mark.parametrize('mode', ['reflect', 'nearest', 'mirror', 'wrap', 'constant'])
+@pytest.mark.parametrize('sigma', [1, 5])
+def test_gaussian_filter_parity(name, mode, sigma, image):
+    compute = get_backend_or_skip(name)
+    reference = backend.NumpyBackend().gaussian_filter(image, sigma, mode=mode)
+    np.testing.assert_allclose(compute.gaussian_filter(image, sigma, mode=mode),
+                               reference, atol=1e-6)
+
+
+@pytest.mark.parametrize('name', backend_names)
+def test_composite_parity(name, image):
+    compute = get_backend_or_skip(name)
+    layers = [np.stack([image, image**2, 1-image, np.ones_like(image)], axis=-1) * weight
+              for weight in (.3, .5, .4)]
+    reference = backend.NumpyBackend().composite(layers)
+    result = compute.composite(layers)
+    assert result.dtype == np.uint8
+    ## Rounding on GPUs may differ by one level
+    assert np.abs(result.astype(int) - reference).max() <= 1
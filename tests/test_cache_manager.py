@@ -0,0 +1,154 @@
+# ------------------------------------------------------------------------------
+#  File: test_cache_manager.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Eviction policy of the cache manager and release of filter caches
+# ------------------------------------------------------------------------------
+
+import os
+import numpy as np
+
+from image_viewer_mk2.filters import cache_manager
+from image_viewer_mk2.filters.pipeline import Pipeline
+
+
+class Owner(object):
+    '''
+    Cache owner recording evicted keys.
+    '''
+
+    def __init__(self):
+        self.evicted = []
+
+    def evict(self, key):
+        self.evicted.append(key)
+
+
+def value(nbytes=100):
+    return np.zeros(nbytes, dtype=np.uint8)
+
+
+def test_evicts_least_recently_used():
+    manager = cache_manager.CacheManager(budget=300)
+    owner = Owner()
+    for key in 'abc':
+        manager.track(owner, key, value())
+        manager.next_frame()
+    manager.touch(owner, 'a')
+    manager.track(owner, 'd', value())
+    assert owner.evicted == ['b']
+    assert manager.usage == 300
+
+
+def test_evicts_hidden_groups_first():
+    manager = cache_manager.CacheManager(budget=200)
+    owner = Owner()
+    manager.track(owner, 'shown', value(), group=0)
+    manager.next_frame()
+    manager.track(owner, 'hidden', value(), group=1)
+    manager.set_hidden(1, True)
+    manager.next_frame()
+    manager.track(owner, 'new', value(), group=0)
+    assert owner.evicted == ['hidden']
+
+
+def test_evicts_early_stages_first():
+    manager = cache_manager.CacheManager(budget=200)
+    owner = Owner()
+    manager.track(owner, 'late', value(), stage=1)
+    manager.track(owner, 'early', value(), stage=0)
+    manager.track(owner, 'new', value(), stage=2)
+    assert owner.evicted == ['early']
+
+
+def test_keeps_new_entry_over_budget():
+    manager = cache_manager.CacheManager(budget=50)
+    owner = Owner()
+    manager.track(owner, 'a', value())
+    assert owner.evicted == []
+    manager.track(owner, 'b', value())
+    assert owner.evicted == ['a']
+
+
+def test_no_budget_never_evicts():
+    manager = cache_manager.CacheManager(budget=None)
+    owner = Owner()
+    for key in range(10):
+        manager.track(owner, key, value(2**20))
+    assert owner.evicted == []
+    assert manager.report()['n_entries'] == 10
+
+
+def test_tracked_cache_drops_evicted():
+    manager = cache_manager.CacheManager(budget=200)
+    cache = cache_manager.TrackedCache(manager=manager)
+    for key in range(3):
+        cache[key] = value()
+        manager.next_frame()
+    assert 0 not in cache
+    assert cache.keys() == [1, 2]
+
+
+def test_tracked_cache_keeps_recent_inputs():
+    manager = cache_manager.CacheManager()
+    cache = cache_manager.TrackedCache(manager=manager, input=lambda key: key[0], max_inputs=2)
+    with cache_manager.slot('stage'):
+        for input in range(4):
+            cache[(input, 'a')] = value()
+            cache[(input, 'b')] = value()
+    assert sorted(cache.keys()) == [(2, 'a'), (2, 'b'), (3, 'a'), (3, 'b')]
+    ## Inputs used by another slot are kept
+    with cache_manager.slot('other'):
+        cache[(2, 'a')]
+    with cache_manager.slot('stage'):
+        cache[(4, 'a')] = value()
+        cache[(5, 'a')] = value()
+    assert sorted(cache.keys()) == [(2, 'a'), (2, 'b'), (4, 'a'), (5, 'a')]
+
+
+def test_resolve_budget():
+    budget = cache_manager.resolve_budget('auto')
+    assert budget == cache_manager.default_budget()
+    assert 0 < budget
+    if hasattr(os, 'sysconf'):
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        assert budget == int(memory * cache_manager.default_budget_fraction)
+    assert cache_manager.resolve_budget(None) is None
+    assert cache_manager.resolve_budget(2**20) == 2**20
+
+
+def test_default_budget_fallback(monkeypatch):
+    def sysconf(name):
+        raise ValueError
+    monkeypatch.setattr(os, 'sysconf', sysconf, raising=False)
+    assert cache_manager.default_budget() == cache_manager.fallback_budget
+
+
+def pipeline_serialization(sigmas):
+    return {'filters': [{'name': 'gaussian_blur', 'params': {'sigma': sigma, 'active': True}}
+                        for sigma in sigmas]}
+
+
+def tracked_filters(manager):
+    return {entry.owner() for entry in manager.entries.values() if entry.key == 'cache'}
+
+
+def test_pipeline_update_releases_caches():
+    manager = cache_manager.get_manager()
+    manager.clear()
+    pipeline = Pipeline.deserialize(pipeline_serialization([1, 2, 3]))
+    pipeline(np.random.default_rng(0).random((32, 32)))
+    first, second, third = pipeline.filters
+    assert {first, second, third} <= tracked_filters(manager)
+
+    ## Changed filter and the ones after it drop their caches
+    pipeline.update(pipeline_serialization([1, 4, 3]))
+    tracked = tracked_filters(manager)
+    assert first in tracked
+    assert second not in tracked and third not in tracked
+
+    ## Removed filters too
+    pipeline.update(pipeline_serialization([1]))
+    pipeline.update(pipeline_serialization([]))
+    assert first not in tracked_filters(manager)
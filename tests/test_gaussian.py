@@ -0,0 +1,48 @@
+# ------------------------------------------------------------------------------
+#  File: test_gaussian.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Accuracy of the gaussian engine against scipy.ndimage.gaussian_filter
+# ------------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from image_viewer_mk2.filters import cache_manager
+from image_viewer_mk2.filters import gaussian
+
+modes = ['reflect', 'mirror', 'nearest', 'wrap', 'constant']
+## Largest deviation from scipy relative to the input range. Scipy truncates
+## the kernel at 4 sigma, the frequency domain does not.
+tolerance = 1e-4
+
+
+@pytest.fixture(params=['smooth', 'noise'])
+def image(request):
+    img = np.random.default_rng(0).random((150, 170))
+    if request.param == 'smooth':
+        img = ndimage.gaussian_filter(img, 2)
+        img[50:80, 40:90] += 1
+    return img
+
+
+@pytest.mark.parametrize('mode', modes)
+@pytest.mark.parametrize('sigma', [2, 10, 10.5, 30, 100])
+def test_matches_scipy(image, mode, sigma):
+    expected = ndimage.gaussian_filter(image, sigma, mode=mode)
+    result = gaussian.gaussian_filter(image, sigma, mode=mode)
+    assert result.shape == image.shape
+    assert np.abs(result - expected).max() <= tolerance * np.ptp(image)
+
+
+@pytest.mark.parametrize('sigma', [5, 30])
+def test_method_independent_of_cache(image, sigma):
+    cache_manager.get_manager().clear()
+    method = gaussian.choose_method(image, sigma)
+    cold = gaussian.gaussian_filter(image, sigma)
+    ## Spectrum of the image is cached now
+    gaussian.fft_gaussian(image, sigma)
+    assert gaussian.choose_method(image, sigma) == method
+    np.testing.assert_array_equal(gaussian.gaussian_filter(image, sigma), cold)
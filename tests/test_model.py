@@ -0,0 +1,93 @@
+# ------------------------------------------------------------------------------
+#  File: test_model.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Undo history of the model with a running renderer
+# ------------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from image_viewer_mk2 import model
+
+
+@pytest.fixture
+def viewer_model(monkeypatch):
+    monkeypatch.setattr(model.Model, 'history_coalesce', 0)
+    with model.Model(use_gpu=False) as m:
+        m.update_image(np.random.default_rng(0).random((64, 64, 2)))
+        settle(m)
+        yield m
+
+
+def settle(m):
+    while m.render_in_flight:
+        m.check_for_render(timeout=5)
+
+
+def params(m):
+    return m.channel_props[0]['pipeline']['filters'][0]['params']
+
+
+def test_toggle_ab_after_edit(viewer_model):
+    m = viewer_model
+    for value in (15, 20):
+        params(m)['kernel_size'] = value
+        settle(m)
+    m.toggle_ab()
+    settle(m)
+    assert params(m)['kernel_size'] == 15
+    m.toggle_ab()
+    settle(m)
+    params(m)['kernel_size'] = 30
+    settle(m)
+    m.toggle_ab()
+    settle(m)
+    assert params(m)['kernel_size'] == 20
+
+
+def test_history_recorded_when_sent(viewer_model):
+    m = viewer_model
+    n_history = len(m.history)
+    params(m)['kernel_size'] = 15
+    assert m.render_in_flight
+    ## Changes made while rendering are recorded once they are sent
+    for value in (11, 12, 13):
+        params(m)['kernel_size'] = value
+    assert len(m.history) == n_history + 1
+    settle(m)
+    assert len(m.history) == n_history + 2
+    assert m.history[-1][0]['pipeline']['filters'][0]['params']['kernel_size'] == 13
+
+    m.undo()
+    settle(m)
+    assert params(m)['kernel_size'] == 15
+
+
+def test_toggle_in_flight_adds_no_step(viewer_model):
+    m = viewer_model
+    params(m)['kernel_size'] = 15
+    settle(m)
+    params(m)['kernel_size'] = 20
+    assert m.render_in_flight
+    m.toggle_ab()
+    n_history = len(m.history), m.history_index
+    settle(m)
+    assert (len(m.history), m.history_index) == n_history
+    assert params(m)['kernel_size'] == 15
+
+
+def test_failed_restore_keeps_recording(viewer_model, monkeypatch):
+    m = viewer_model
+    def failing_load(model_dict):
+        raise ValueError
+    monkeypatch.setattr(m, 'load', failing_load)
+    with pytest.raises(ValueError):
+        m.restore(m.history[0])
+    monkeypatch.undo()
+
+    n_history = len(m.history)
+    params(m)['kernel_size'] = 15
+    settle(m)
+    assert len(m.history) == n_history + 1
@@ -0,0 +1,99 @@
+# ------------------------------------------------------------------------------
+#  File: test_planner.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Planned and fused pipelines against filters applied one by one
+# ------------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from image_viewer_mk2.filters import cache_manager
+from image_viewer_mk2.filters import filter_factory
+from image_viewer_mk2.filters import planner
+from image_viewer_mk2.filters.pipeline import Pipeline, FusedPointwise
+
+## Parameters of each filter, including degenerate ones the planner rewrites
+filter_choices = [('gamma_correction', {'gamma': 1}),
+                  ('gamma_correction', {'gamma': 2.2}),
+                  ('gamma_correction', {'gamma': .5}),
+                  ('minmax_norm', {'in_min': 0, 'in_max': 1, 'out_min': 0, 'out_max': 1}),
+                  ('minmax_norm', {'in_min': 0, 'in_max': 2, 'out_min': 0, 'out_max': 2}),
+                  ('minmax_norm', {'in_min': .1, 'in_max': .9, 'out_min': 0, 'out_max': 1}),
+                  ('sigmoid_norm', {}),
+                  ('unsharp_mask', {'strength': 0, 'kernel_size': 3}),
+                  ('unsharp_mask', {'strength': 1, 'kernel_size': 3}),
+                  ('gaussian_blur', {'sigma': 2})]
+
+
+def filter_dict(name, params, active=True):
+    T_filter = filter_factory.get_filter_by_name(name)
+    serialization = T_filter(**params).serialize()
+    serialization['params']['active'] = active
+    return serialization
+
+
+def random_pipeline(rng, n_filters):
+    filters = []
+    for _ in range(n_filters):
+        name, params = filter_choices[rng.integers(len(filter_choices))]
+        filters.append(filter_dict(name, params, active=rng.random() > .1))
+    return {'filters': filters}
+
+
+def sequential(serialization, img):
+    for filter in serialization['filters']:
+        T_filter = filter_factory.get_filter_by_name(filter['name'])
+        img = T_filter.deserialize(filter['params'])(img)
+    return img
+
+
+@pytest.fixture(params=['unit', 'shifted'])
+def image(request):
+    img = np.random.default_rng(0).random((40, 50))
+    ## Range not starting at zero, but within [0;1], so that the clips do not
+    ## turn the image constant
+    if request.param == 'shifted':
+        img = img * .6 + .2
+    return img
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_planned_pipeline_matches_sequential(image, seed):
+    cache_manager.get_manager().clear()
+    serialization = random_pipeline(np.random.default_rng(seed), 6)
+    expected = sequential(serialization, image)
+    np.testing.assert_array_equal(Pipeline.deserialize(serialization)(image), expected)
+    np.testing.assert_array_equal(Pipeline.call(serialization, image), expected)
+
+
+@pytest.mark.parametrize('n_rescales', [1, 2, 3])
+def test_rescales_merged(image, n_rescales):
+    serialization = {'filters': [filter_dict('gamma_correction', {'gamma': 1})] * n_rescales}
+    plan = planner.make_plan(serialization)
+    assert len(plan.steps) == 1
+    assert [T_filter for T_filter, _ in plan.steps[0].filters] == [planner.RescaleToRange]
+    assert plan.steps[0].indices == list(range(n_rescales))
+    np.testing.assert_array_equal(Pipeline.call(serialization, image),
+                                  sequential(serialization, image))
+
+
+def test_fused_pointwise_matches_sequential(image):
+    names = [('gamma_correction', {'gamma': 2.2}),
+             ('minmax_norm', {'in_min': .1, 'in_max': .9, 'out_min': 0, 'out_max': 1}),
+             ('sigmoid_norm', {})]
+    filters = [(filter_factory.get_filter_by_name(name), filter_dict(name, params)['params'])
+               for name, params in names]
+    ## Blocks smaller than the image
+    fused = FusedPointwise(filters)
+    fused.block_size = 256
+    expected = sequential({'filters': [filter_dict(name, params) for name, params in names]}, image)
+    np.testing.assert_array_equal(fused(image), expected)
+
+
+def test_rescale_of_constant_image():
+    ## The gamma filter divides zero by zero here, the planned rescale does not
+    serialization = {'filters': [filter_dict('gamma_correction', {'gamma': 1})]}
+    img = np.full((10, 10), .5)
+    np.testing.assert_array_equal(Pipeline.call(serialization, img), img)
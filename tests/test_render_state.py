@@ -0,0 +1,212 @@
+# ------------------------------------------------------------------------------
+#  File: test_render_state.py
+#  Author: Jan Kukacka
+#  Date: 10/2026
+# ------------------------------------------------------------------------------
+#  Versioned delta render tasks between the model and the renderer's state,
+#  and speculation planned from them
+# ------------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from image_viewer_mk2 import model
+from image_viewer_mk2.renderer import RenderState, plan_speculation
+from image_viewer_mk2.filters.filter_factory import get_filter_by_name
+from image_viewer_mk2.ObservableCollections.utils import make_plain
+
+
+@pytest.fixture
+def viewer_model():
+    ## Processes are not started, the test plays the renderer
+    m = model.Model(use_gpu=False)
+    m.history_coalesce = 0
+    m.update_image(np.random.default_rng(0).random((16, 16, 3)))
+    yield m
+    m.frames.close()
+
+
+class Renderer(object):
+    '''
+    Receives the render tasks of a model and answers them like the render
+    process, without rendering.
+    '''
+
+    def __init__(self, m):
+        self.model = m
+        self.state = RenderState()
+        self.n_received = 0
+
+    def receive(self):
+        '''
+        Returns the tasks sent since the last call.
+        '''
+        tasks = []
+        while self.n_received < self.model.render_version:
+            tasks.append(self.model.rendering_queue.get(timeout=5))
+            self.n_received += 1
+        return tasks
+
+    def answer(self, tasks=None):
+        '''
+        Applies the tasks to the state and sends back a frame, or a resync
+        request if a task was missed.
+        '''
+        if tasks is None:
+            tasks = self.receive()
+        for task in tasks:
+            self.state.apply(task)
+        if self.state.resync_needed:
+            stats = {'resync': True}
+        else:
+            stats = {'version': self.state.version}
+            self.state.rendered()
+        self.model.rendered_queue.put((None, stats))
+        assert self.model.check_for_render(timeout=5)
+
+    def settle(self):
+        while self.model.render_in_flight:
+            self.answer()
+
+    def in_sync(self):
+        return (not self.state.resync_needed
+                and self.state.version == self.model.render_version
+                and self.state.channel_properties == make_plain(self.model.channel_props))
+
+
+def random_edit(m, rng):
+    channel_index = int(rng.integers(len(m.channel_props)))
+    channel = m.channel_props[channel_index]
+    filters = channel['pipeline']['filters']
+    edit = rng.integers(8)
+    if edit == 0 and len(filters) > 0:
+        params = filters[int(rng.integers(len(filters)))]['params']
+        key = rng.choice([key for key, value in params.items()
+                          if isinstance(value, (int, float)) and not isinstance(value, bool)])
+        params[key] = params[key] + 1
+    elif edit == 1:
+        channel['color'] = '#%06x' % rng.integers(2**24)
+    elif edit == 2:
+        channel['visible'] = not channel['visible']
+    elif edit == 3:
+        m.add_filter(channel_index, filter_name='gamma_correction')
+    elif edit == 4 and len(filters) > 0:
+        m.remove_filter(channel_index, len(filters) - 1)
+    elif edit == 5:
+        m.undo()
+    elif edit == 6:
+        m.redo()
+    else:
+        m.toggle_ab()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_edits_converge(viewer_model, seed):
+    m = viewer_model
+    renderer = Renderer(m)
+    rng = np.random.default_rng(seed)
+    for _ in range(40):
+        if rng.random() < .2:
+            with m.batch():
+                for _ in range(3):
+                    random_edit(m, rng)
+        else:
+            random_edit(m, rng)
+        ## Frames land at random times, changes meanwhile are collected
+        if rng.random() < .5:
+            renderer.answer()
+    renderer.settle()
+    assert renderer.in_sync()
+
+
+def test_parameter_change_is_delta(viewer_model):
+    m = viewer_model
+    renderer = Renderer(m)
+    renderer.settle()
+    m.channel_props[1]['pipeline']['filters'][0]['params']['kernel_size'] = 15
+    task, = renderer.receive()
+    assert 'full' not in task and 'channel_properties' not in task
+    assert list(task['filters']) == [(1, 0)]
+    renderer.answer([task])
+    assert renderer.state.edits == []
+    assert renderer.in_sync()
+
+
+def test_out_of_order_tasks_resync(viewer_model):
+    m = viewer_model
+    renderer = Renderer(m)
+    renderer.settle()
+    params = m.channel_props[0]['pipeline']['filters'][0]['params']
+    params['kernel_size'] = 15
+    first, = renderer.receive()
+    ## Frame lands without the renderer seeing the task, the next one is sent
+    params['kernel_size'] = 16
+    m.rendered_queue.put((None, {'version': first['version']}))
+    m.check_for_render(timeout=5)
+    second, = renderer.receive()
+
+    renderer.answer([second, first])
+    resync, = renderer.receive()
+    assert resync['full']
+    renderer.answer([resync])
+    assert renderer.in_sync()
+
+
+def test_missed_task_resync(viewer_model):
+    m = viewer_model
+    renderer = Renderer(m)
+    renderer.settle()
+    m.channel_props[2]['color'] = '#ff0000'
+    missed, = renderer.receive()
+    m.channel_props[2]['color'] = '#00ff00'
+    m.rendered_queue.put((None, {'version': missed['version']}))
+    m.check_for_render(timeout=5)
+
+    renderer.answer()
+    assert renderer.state.resync_needed
+    resync, = renderer.receive()
+    assert resync['full']
+    renderer.answer([resync])
+    assert renderer.in_sync()
+    assert renderer.state.channel_properties[2]['color'] == '#00ff00'
+
+
+def test_delta_of_unknown_channel_resyncs():
+    state = RenderState()
+    state.apply({'full': True, 'version': 1, 'channel_properties': [{'visible': True}]})
+    state.apply({'version': 2, 'base_version': 1, 'channels': {3: {'visible': False}}})
+    assert state.resync_needed
+    ## Deltas are ignored until a full task
+    state.apply({'version': 3, 'base_version': 2, 'channels': {0: {'visible': False}}})
+    assert state.channel_properties == [{'visible': True}]
+    state.apply({'full': True, 'version': 4, 'channel_properties': [{'visible': False}]})
+    assert not state.resync_needed
+    assert state.version == 4
+
+
+def edited_state(names, active, filter_index, param, value):
+    filters = [get_filter_by_name(name)().serialize() for name in names]
+    for filter_dict, is_active in zip(filters, active):
+        filter_dict['params']['active'] = is_active
+    channel_properties = [{'visible': True, 'color': '#ffffff', 'pipeline': {'filters': filters}}]
+    state = RenderState()
+    state.apply({'full': True, 'version': 1, 'channel_properties': channel_properties})
+    state.rendered()
+    new_filter = dict(filters[filter_index], params=dict(filters[filter_index]['params']))
+    new_filter['params'][param] = value
+    state.apply({'version': 2, 'base_version': 1, 'filters': {(0, filter_index): new_filter}})
+    return state
+
+
+@pytest.mark.parametrize('filter_index, param, value, frangi_active, n_jobs',
+                         [(0, 'kernel_size', 11, True, 0),
+                          (1, 'alpha', .6, True, 0),
+                          (2, 'upper', 99, True, 2),
+                          (0, 'kernel_size', 11, False, 2)])
+def test_no_speculation_before_expensive_filters(filter_index, param, value, frangi_active, n_jobs):
+    state = edited_state(['local_norm', 'frangi', 'sigmoid_norm'], [True, frangi_active, True],
+                         filter_index, param, value)
+    jobs = plan_speculation(state)
+    assert len(jobs) == n_jobs
+    for _, channel_property in jobs:
+        assert channel_property['pipeline']['filters'][filter_index]['params'][param] != value